@@ -0,0 +1,25 @@
+"""Posts keyset index
+
+Revision ID: 3b9d1c7e4a52
+Revises: f0f62560b26f
+Create Date: 2026-10-18 09:12:41.203114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d1c7e4a52'
+down_revision = 'f0f62560b26f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_posts_publication_date_id', 'posts', ['publication_date', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_publication_date_id', table_name='posts')
@@ -0,0 +1,37 @@
+"""Posts comment_count
+
+Revision ID: 5c81f0b6d2e9
+Revises: a7e2c4d91f38
+Create Date: 2026-10-18 10:41:09.332757
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c81f0b6d2e9'
+down_revision = 'a7e2c4d91f38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'posts',
+        sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # Backfill from the comments that already exist.
+    op.execute(
+        """
+        UPDATE posts SET comment_count = (
+            SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    # Plain ALTER TABLE DROP COLUMN (SQLite >= 3.35): a batch table rebuild
+    # would drop the posts_fts triggers along with the old table.
+    op.drop_column('posts', 'comment_count')
@@ -0,0 +1,59 @@
+"""Posts full-text search
+
+Revision ID: a7e2c4d91f38
+Revises: 3b9d1c7e4a52
+Create Date: 2026-10-18 10:03:27.581942
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e2c4d91f38'
+down_revision = '3b9d1c7e4a52'
+branch_labels = None
+depends_on = None
+
+# A copy of search.FTS_DDL as of this revision, kept here so later changes to
+# the app can't rewrite what this migration did. IF NOT EXISTS because the
+# app creates the same objects at startup (search.ensure_search_index), and
+# upgrading a database the app has already run against must not fail.
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content, content='posts', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+
+def upgrade() -> None:
+    for statement in FTS_DDL:
+        op.execute(statement)
+    # Index the rows that already exist.
+    op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_ai')
+    op.execute('DROP TABLE IF EXISTS posts_fts')
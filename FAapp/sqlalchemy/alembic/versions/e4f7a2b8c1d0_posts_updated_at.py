@@ -0,0 +1,24 @@
+"""Posts updated_at
+
+Revision ID: e4f7a2b8c1d0
+Revises: 5c81f0b6d2e9
+Create Date: 2026-10-18 11:26:53.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f7a2b8c1d0'
+down_revision = '5c81f0b6d2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'updated_at')
@@ -1,29 +1,102 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status 
-from typing import List, Tuple, cast, Mapping
+import anyio
+import sqlalchemy
+from datetime import datetime
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status 
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from databases import Database
-from database import sqlalchemy_engine, get_database
+from database import sqlalchemy_engine, get_database, get_read_database
+from cursors import encode_cursor, decode_cursor
+from common.cache import LRUTTLCache
+from bulk import BulkBodyError, BulkBodyTooLarge, insert_comments, insert_posts, validate_bulk_items
+from export import EXPORT_MEDIA_TYPES, ExportFormat, csv_export, ndjson_export
+from search import ensure_search_index, search_posts
+from comment_queue import CommentQueue, CommentQueueFull, comment_queue_settings
+from feed import comment_broker, comment_events, parse_event_id, publish_comments
+from common.broker import Subscription, SubscriptionClosed, event_message, format_sse
+from responses import build_model, render_json, respond
+from common.conditional import check_if_match, conditional_response, make_etag
+from common.ratelimit import RATE_LIMIT_DEFAULT, RateLimit, RateLimitMiddleware, parse_rate_limit
+from common.compression import CompressionMiddleware
+from common.metrics import MetricsMiddleware, cache_collector, metrics_endpoint, registry
 from models import( 
         metadata, 
         comments,
         posts,
+        BulkItemResult,
         CommentCreate,
         CommentDB,
         PostDB,
         PostCreate,
         PostPartialUpdate,
-        PostPublic 
+        PostPublic,
+        PostSearchResult,
 )
 
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+
+# Per client (Token header, else IP). Bulk and export requests are expensive
+# enough to get their own, much smaller buckets; other routes are only
+# limited when RATE_LIMIT_DEFAULT is set (e.g. "50/100").
+app.add_middleware(
+    RateLimitMiddleware,
+    default =   parse_rate_limit(RATE_LIMIT_DEFAULT),
+    routes  =   {
+        '/posts/bulk'       :   RateLimit(rate=0.5, burst=2),
+        '/comments/bulk'    :   RateLimit(rate=0.5, burst=2),
+        '/posts/export'     :   RateLimit(rate=0.1, burst=1),
+        '/posts/search'     :   RateLimit(rate=5, burst=10),
+    },
+)
+# Added last so it wraps the rate limiter and also counts rejected requests.
+app.add_middleware(MetricsMiddleware)
+app.add_route('/metrics', metrics_endpoint, include_in_schema=False)
+
+POST_CACHE_MAXSIZE      = 1024
+POST_CACHE_TTL          = 30.0
+POST_LIST_CACHE_MAXSIZE = 256
+POST_LIST_CACHE_TTL     = 5.0
+
+# Posts are keyed on (id, with_comments), list pages on (skip, limit, cursor).
+post_cache      = LRUTTLCache(maxsize=POST_CACHE_MAXSIZE, ttl=POST_CACHE_TTL)
+post_list_cache = LRUTTLCache(maxsize=POST_LIST_CACHE_MAXSIZE, ttl=POST_LIST_CACHE_TTL)
+registry.add_collector(cache_collector({'post': post_cache, 'post_list': post_list_cache}))
+
+
+def invalidate_post(id: int) -> None:
+    post_cache.invalidate((id, True))
+    post_cache.invalidate((id, False))
+    post_list_cache.clear()
+
+
+async def comments_flushed(flushed: Sequence[Tuple[CommentCreate, Dict[str, Any]]]) -> None:
+    created = [CommentDB(id=result['id'], **comment.dict()) for comment, result in flushed if 'id' in result]
+    for post_id in {comment.post_id for comment in created}:
+        invalidate_post(post_id)
+    publish_comments(created)
+
+
+comment_queue = CommentQueue(get_database, on_flushed=comments_flushed)
+
 
 @app.on_event('startup')
 async def startup():
     await get_database().connect()
+    if get_read_database() is not get_database():
+        await get_read_database().connect()
     metadata.create_all(sqlalchemy_engine)
+    ensure_search_index(sqlalchemy_engine)
+    if comment_queue_settings.enabled:
+        await comment_queue.start()
     
 @app.on_event('shutdown')
 async def shutdown():
+    # Queued comments are written before the connections go away.
+    await comment_queue.stop()
+    if get_read_database() is not get_database():
+        await get_read_database().disconnect()
     await get_database().disconnect()
     
 
@@ -34,85 +107,386 @@ async def pagination(
     capped_limit = min(100, limit)
     return (skip, capped_limit)
 
-async def get_post_or_404(
-    id: int, database: Database = Depends(get_database)
-) -> PostPublic:
-    select_query    =   posts.select().where(posts.c.id == id)
-    raw_post        =   await database.fetch_one(select_query)
-    if raw_post is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    
-    select_post_comments_query  =   comments.select().where(comments.c.post_id == id)
-    raw_comments                =   await database.fetch_all(select_post_comments_query)
-    comments_list               =   [CommentDB(**comment) for comment in raw_comments]
-    
-    return PostPublic(**raw_post, comments=comments_list)
+# Loads a post in one round trip: a LEFT OUTER JOIN on comments when they
+# are needed (the post columns repeat on every comment row), the bare post
+# row otherwise.
+class PostLoader:
+
+    def __init__(self, with_comments: bool = True):
+        self.with_comments = with_comments
+
+    async def __call__(
+        self, id: int, database: Database = Depends(get_read_database)
+    ) -> PostDB:
+        cache_key   = (id, self.with_comments)
+        cached_post = post_cache.get(cache_key)
+        if cached_post is not None:
+            return cached_post
+        epoch       = post_cache.epoch
+
+        post = await self.load(database, id)
+        if post is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        post_cache.put(cache_key, post, epoch)
+        return post
+
+    async def load(self, database: Database, id: int) -> Optional[PostDB]:
+        if not self.with_comments:
+            select_query    =   posts.select().where(posts.c.id == id)
+            raw_post        =   await database.fetch_one(select_query)
+            if raw_post is None:
+                return None
+            return build_model(PostDB, **raw_post)
+
+        select_query = (
+            sqlalchemy.select(
+                posts,
+                comments.c.id.label('comment_id'),
+                comments.c.publication_date.label('comment_publication_date'),
+                comments.c.content.label('comment_content'),
+            )
+            .select_from(posts.outerjoin(comments))
+            .where(posts.c.id == id)
+            .order_by(comments.c.id)
+        )
+        rows = await database.fetch_all(select_query)
+        if not rows:
+            return None
+
+        raw_post        =   {column.name: rows[0][column.name] for column in posts.c}
+        comments_list   =   [
+            {
+                'id'                :   row['comment_id'],
+                'post_id'           :   id,
+                'publication_date'  :   row['comment_publication_date'],
+                'content'           :   row['comment_content'],
+            }
+            for row in rows
+            if row['comment_id'] is not None
+        ]
+        return build_model(PostPublic, **raw_post, comments=comments_list)
+
+
+get_post_or_404     = PostLoader(with_comments=True)
+get_post_db_or_404  = PostLoader(with_comments=False)
 
 
 @app.post('/posts', response_model=PostDB, status_code=status.HTTP_201_CREATED)
 async def create_post(post: PostCreate, database: Database = Depends(get_database)) -> PostDB:
-    insert_query    = posts.insert().value(post.dict())
+    insert_query    = posts.insert().values(post.dict())
     post_id         = await database.execute(insert_query)
-    post_db         = await get_post_or_404(post_id, database)
+    post_list_cache.clear()
+    post_db         = await get_post_db_or_404(post_id, database)
     return post_db
+
+# Bulk ingest: a JSON array or an NDJSON stream of PostCreate objects, written
+# in chunks with execute_many inside a single transaction. Items that fail
+# validation are reported and skipped; the others are still inserted.
+@app.post('/posts/bulk', response_model=List[BulkItemResult])
+async def create_posts_bulk(
+    request     :   Request,
+    database    :   Database = Depends(get_database),
+) -> List[BulkItemResult]:
+    try:
+        results, valid = await validate_bulk_items(request, PostCreate)
+    except BulkBodyTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except BulkBodyError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    post_ids = await insert_posts(database, [post for _, post in valid])
+    for (index, _), post_id in zip(valid, post_ids):
+        results[index].id = post_id
+    post_list_cache.clear()
+    return results
     
-@app.get('/posts')
+# Pages are ordered on (publication_date, id). The body is the plain list of
+# posts, as before; when a page is full, the cursor for the next one goes in
+# X-Next-Cursor and a Link rel="next" header. Passing it back as `cursor`
+# seeks straight to that page through ix_posts_publication_date_id instead of
+# scanning and discarding `skip` rows; `skip` keeps working without a cursor.
+@app.get('/posts', response_model=List[PostDB])
 async def list_posts(
+    request     :   Request,
+    response    :   Response,
     pagination  :   Tuple[int, int]     = Depends(pagination),
-    database    :   Database            = Depends(get_database),
+    cursor      :   Optional[str]       = Query(None),
+    database    :   Database            = Depends(get_read_database),
 ) -> List[PostDB]:
     skip, limit     = pagination
-    select_query    = post.select().offset(skip).limit(limit)
+    cache_key       = (skip, limit, cursor)
+    cached_page     = post_list_cache.get(cache_key)
+    if cached_page is None:
+        epoch       = post_list_cache.epoch
+        cached_page = await fetch_posts_page(database, skip, limit, cursor)
+        post_list_cache.put(cache_key, cached_page, epoch)
+
+    results, next_cursor = cached_page
+    headers         = {}
+    if next_cursor is not None:
+        next_url    = request.url.remove_query_params('skip').include_query_params(cursor=next_cursor, limit=limit)
+        headers     = {'X-Next-Cursor': next_cursor, 'Link': f'<{next_url}>; rel="next"'}
+    response.headers.update(headers)
+    return respond(results, headers)
+
+async def fetch_posts_page(
+    database: Database, skip: int, limit: int, cursor: Optional[str]
+) -> Tuple[List[PostDB], Optional[str]]:
+    select_query    = (
+        posts.select()
+        .order_by(posts.c.publication_date, posts.c.id)
+        .limit(limit)
+    )
+    if cursor is not None:
+        try:
+            publication_date, last_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        select_query = select_query.where(
+            sqlalchemy.tuple_(posts.c.publication_date, posts.c.id)
+            > sqlalchemy.tuple_(publication_date, last_id)
+        )
+    else:
+        select_query = select_query.offset(skip)
+
     rows            = await database.fetch_all(select_query)
-    results         = [PostDB(**row) for row in rows]
-    return results 
+    results         = [build_model(PostDB, **row) for row in rows]
+    next_cursor     = None
+    if limit and len(results) == limit:
+        last_post   = results[-1]
+        next_cursor = encode_cursor(last_post.publication_date, last_post.id)
+    return results, next_cursor
+
+@app.get('/posts/search', response_model=List[PostSearchResult])
+async def search(
+    q           :   str         = Query(..., min_length=1),
+    limit       :   int         = Query(10, ge=1, le=100),
+    database    :   Database    = Depends(get_read_database),
+) -> List[PostSearchResult]:
+    return await search_posts(database, q, limit)
 
-@app.get('/posts/{id}', response_model=PostDB)
-async def get_post(post: PostDB = Depends(get_post_or_404)) -> PostDB:
-    return post
+# Streams the whole table chunk by chunk; declared before /posts/{id} so
+# 'export' isn't parsed as an id.
+@app.get('/posts/export')
+async def export_posts(
+    format          :   ExportFormat    = Query(ExportFormat.NDJSON),
+    with_comments   :   bool            = Query(False, alias='comments'),
+    database        :   Database        = Depends(get_read_database),
+) -> StreamingResponse:
+    exporter = ndjson_export if format == ExportFormat.NDJSON else csv_export
+    return StreamingResponse(
+        exporter(database, with_comments),
+        media_type  =   EXPORT_MEDIA_TYPES[format],
+        headers     =   {'Content-Disposition': f'attachment; filename="posts.{format.value}"'},
+    )
+
+# The ETag is a digest of the exact body, so it changes whenever the post or
+# any of its comments does; Last-Modified follows updated_at, which every
+# post and comment write bumps.
+@app.get('/posts/{id}', response_model=PostPublic)
+async def get_post(
+    request     :   Request,
+    post        :   PostPublic = Depends(get_post_or_404),
+) -> Response:
+    return conditional_response(
+        request.headers,
+        render_json(post),
+        last_modified=post.updated_at or post.publication_date,
+    )
 
 
 
+# Live comments: Server-Sent Events, or the same events over a WebSocket.
+# Reconnecting clients send the last id they saw (Last-Event-ID, or
+# ?last_event_id= for the first connection) and get what they missed first.
+@app.get('/posts/{id}/comments/stream')
+async def stream_comments(
+    request         :   Request,
+    post            :   PostDB              = Depends(get_post_db_or_404),
+    last_event_id   :   Optional[str]       = Query(None),
+    database        :   Database            = Depends(get_read_database),
+) -> StreamingResponse:
+    resume_from = parse_event_id(request.headers.get('last-event-id') or last_event_id)
+
+    async def events():
+        with comment_broker.subscribe(post.id) as subscription:
+            try:
+                async for event in comment_events(database, post.id, subscription, resume_from):
+                    yield format_sse(event)
+            except SubscriptionClosed:
+                # Too far behind: the client reconnects and resumes.
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type  =   'text/event-stream',
+        headers     =   {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.websocket('/posts/{id}/comments/ws')
+async def stream_comments_ws(
+    websocket       :   WebSocket,
+    id              :   int,
+    last_event_id   :   Optional[str]   = Query(None),
+):
+    database = get_read_database()
+    if await get_post_db_or_404.load(database, id) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def forward(subscription: Subscription, done: anyio.CancelScope) -> None:
+        try:
+            async for event in comment_events(database, id, subscription, parse_event_id(last_event_id)):
+                if event is not None:
+                    await websocket.send_json(event_message(event))
+        except SubscriptionClosed:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        done.cancel()
+
+    # Nothing is sent while a post is quiet, so a disconnect is noticed by
+    # reading from the socket alongside.
+    with comment_broker.subscribe(id) as subscription:
+        try:
+            async with anyio.create_task_group() as tasks:
+                tasks.start_soon(forward, subscription, tasks.cancel_scope)
+                while (await websocket.receive())['type'] != 'websocket.disconnect':
+                    pass
+                tasks.cancel_scope.cancel()
+        except WebSocketDisconnect:
+            pass
+
 @app.patch('/posts/{id}', response_model=PostDB)
 async def update_post(
     post_update     :       PostPartialUpdate,
-    post            :       PostDB      = Depends(get_post_or_404),
-    database        :       Database    = Depends(get_database),
+    response        :       Response,
+    post            :       PostDB          = Depends(get_post_db_or_404),
+    if_match        :       Optional[str]   = Header(None),
+    database        :       Database        = Depends(get_database),
 )   ->  PostDB:
     update_query = (
-        post.update()
+        posts.update()
         .where(posts.c.id == post.id)
-        .values(post_update.dict(exclude_unset=True))
+        .values(dict(post_update.dict(exclude_unset=True), updated_at=datetime.now()))
     )
-    post_id = await database.execute(update_query)
-    post_db = await get_post_or_404(post_id, database)
+    if if_match is None:
+        await database.execute(update_query)
+    else:
+        # Compare against the ETag GET /posts/{id} would send, read on the
+        # writer inside the update's transaction so no write slips in between.
+        async with database.transaction():
+            current = await get_post_or_404.load(database, post.id)
+            check_if_match(if_match, current and make_etag(render_json(current)))
+            await database.execute(update_query)
+            updated = await get_post_or_404.load(database, post.id)
+        response.headers['ETag'] = make_etag(render_json(updated))
+    invalidate_post(post.id)
+    post_db = await get_post_db_or_404(post.id, database)
     return post_db
 
 @app.delete('/posts/{id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
-    post        : PostDB    = Depends(get_post_or_404),
+    post        : PostDB    = Depends(get_post_db_or_404),
     database    : Database  = Depends(get_database),
 ):
     delete_query = posts.delete().where(posts.c.id == post.id)
     await database.execute(delete_query)
+    invalidate_post(post.id)
     
     
 #comments
-@app.post('/comments',  response_model=CommentDB, status_code=status.HTTP_201_CREATED)
+@app.post(
+    '/comments',
+    response_model  =   CommentDB,
+    status_code     =   status.HTTP_201_CREATED,
+    responses       =   {status.HTTP_202_ACCEPTED: {'description': 'Queued (COMMENT_QUEUE_ENABLED)'}},
+)
 async def create_comment(
     comment     :   CommentCreate, 
     database    :   Database = Depends(get_database)
-) -> CommentDB:
-    select_post_query = posts.select().where(posts.c.id == comment.post_id)
-    post              = await database.fetch_one(select_post_query)
-    if post is None:
-        raise HTTPException(
-            status_code =   status.HTTP_400_BAD_REQUEST,
-            detail      =   f'Post {id} does not exist'
+):
+    if comment_queue_settings.enabled:
+        try:
+            ticket = await comment_queue.submit(comment)
+        except CommentQueueFull as e:
+            raise HTTPException(
+                status_code =   status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail      =   str(e),
+                headers     =   {'Retry-After': '1'},
+            )
+        return JSONResponse(
+            {'ticket': ticket, 'status': 'queued'},
+            status_code =   status.HTTP_202_ACCEPTED,
+            headers     =   {'Location': f'/comments/queued/{ticket}'},
+        )
+
+    # The insert and the comment_count bump commit together, so the
+    # denormalized count never drifts from the comments table.
+    async with database.transaction():
+        select_post_query = sqlalchemy.select(posts.c.id).where(posts.c.id == comment.post_id)
+        post              = await database.fetch_one(select_post_query)
+        if post is None:
+            raise HTTPException(
+                status_code =   status.HTTP_400_BAD_REQUEST,
+                detail      =   f'Post {comment.post_id} does not exist'
+            )
+        insert_query    = comments.insert().values(comment.dict())
+        comment_id      = await database.execute(insert_query)
+        await database.execute(
+            posts.update()
+            .where(posts.c.id == comment.post_id)
+            .values(comment_count=posts.c.comment_count + 1, updated_at=datetime.now())
         )
-    insert_query    = comments.insert().values(comment.dict())
-    comment_id      = await database.execute(insert_query)
-    select_query    = comments.select().where(comments.c.id == comment_id)
-    raw_comment     = cast(Mapping, await database.fetch_one(select_query))
-    return CommentDB(**raw_comment)
+    invalidate_post(comment.post_id)
+    # Every column was just written from `comment`; no need to read it back.
+    created = CommentDB(id=comment_id, **comment.dict())
+    publish_comments([created])
+    return created
+
+@app.get('/comments/queued/{ticket}')
+async def get_queued_comment(ticket: str):
+    outcome = comment_queue.status(ticket)
+    if outcome is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return outcome
+
+@app.delete('/comments/{id}', status_code=status.HTTP_204_NO_CONTENT)
+async def delete_comment(
+    id          :   int,
+    database    :   Database = Depends(get_database),
+):
+    async with database.transaction():
+        select_query    = sqlalchemy.select(comments.c.post_id).where(comments.c.id == id)
+        raw_comment     = await database.fetch_one(select_query)
+        if raw_comment is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        await database.execute(comments.delete().where(comments.c.id == id))
+        await database.execute(
+            posts.update()
+            .where(posts.c.id == raw_comment['post_id'])
+            .values(comment_count=posts.c.comment_count - 1, updated_at=datetime.now())
+        )
+    invalidate_post(raw_comment['post_id'])
+
+@app.post('/comments/bulk', response_model=List[BulkItemResult])
+async def create_comments_bulk(
+    request     :   Request,
+    database    :   Database = Depends(get_database),
+) -> List[BulkItemResult]:
+    try:
+        results, valid = await validate_bulk_items(request, CommentCreate)
+    except BulkBodyTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except BulkBodyError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    outcomes        = await insert_comments(database, [comment for _, comment in valid])
+    created         = []
+    for (index, comment), outcome in zip(valid, outcomes):
+        results[index].id       = outcome.get('id')
+        results[index].error    = outcome.get('error')
+        if results[index].id is not None:
+            created.append(CommentDB(id=results[index].id, **comment.dict()))
+    for post_id in {comment.post_id for comment in created}:
+        invalidate_post(post_id)
+    publish_comments(created)
+    return results
 
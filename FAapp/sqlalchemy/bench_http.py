@@ -0,0 +1,246 @@
+"""HTTP benchmark for the posts API, driven in-process through ASGI.
+
+Run from this directory with `python bench_http.py`. A fresh SQLite
+database is seeded with --posts posts and --comments comments per post,
+then each scenario (get post, list posts at several offsets, create comment,
+patch post) is run at every --concurrency level. Throughput and p50/p95/p99
+latencies are printed and written to --output as JSON.
+
+Pass --baseline with an earlier output file to compare against it: any
+scenario whose throughput dropped or p99 rose by more than --threshold is
+reported and the exit status is 1. Rate limiting is disabled, everything
+else (caches, metrics, serialization) runs as in production; use --no-cache
+to measure the database path. DATABASE_* settings (e.g.
+DATABASE_SQLITE_PRAGMAS=1) apply as usual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+
+DEFAULT_DATABASE    = os.path.join(tempfile.gettempdir(), 'bench_http.db')
+SEED_BATCH_SIZE     = 1000
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10_000)
+    parser.add_argument('--comments', type=int, default=5, help='comments per post')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario and level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--offsets', type=int, nargs='+', default=[0, 1000, 5000])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help='disable the post and list caches')
+    parser.add_argument('--output', default='bench_http.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative regression')
+    return parser.parse_args()
+
+
+def seed(engine: Any, posts_table: Any, comments_table: Any, args: argparse.Namespace) -> None:
+    start   = datetime(2023, 1, 1)
+    content = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4
+    with engine.begin() as connection:
+        for first in range(1, args.posts + 1, SEED_BATCH_SIZE):
+            ids = range(first, min(first + SEED_BATCH_SIZE, args.posts + 1))
+            connection.execute(posts_table.insert(), [
+                {
+                    'id'                :   id,
+                    'publication_date'  :   start + timedelta(minutes=id),
+                    'title'             :   f'Post {id}',
+                    'content'           :   content,
+                    'comment_count'     :   args.comments,
+                }
+                for id in ids
+            ])
+            if args.comments:
+                connection.execute(comments_table.insert(), [
+                    {
+                        'post_id'           :   id,
+                        'publication_date'  :   start + timedelta(minutes=id, seconds=n),
+                        'content'           :   f'Comment {n} on post {id}',
+                    }
+                    for id in ids
+                    for n in range(args.comments)
+                ])
+
+
+def build_scenarios(args: argparse.Namespace) -> Dict[str, Scenario]:
+    def random_post(rng: random.Random) -> int:
+        return rng.randint(1, args.posts)
+
+    async def get_post(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        return await client.get(f'/posts/{random_post(rng)}')
+
+    def list_posts(skip: int) -> Scenario:
+        async def scenario(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+            return await client.get('/posts', params={'skip': skip, 'limit': 10})
+        return scenario
+
+    async def create_comment(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        return await client.post('/comments', json={'post_id': random_post(rng), 'content': 'Benchmark comment'})
+
+    async def patch_post(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        return await client.patch(f'/posts/{random_post(rng)}', json={'title': f'Edited {rng.random():.6f}'})
+
+    scenarios: Dict[str, Scenario] = {'get_post': get_post}
+    for skip in args.offsets:
+        if skip < args.posts:
+            scenarios[f'list_posts?skip={skip}'] = list_posts(skip)
+    scenarios['create_comment'] = create_comment
+    scenarios['patch_post']     = patch_post
+    return scenarios
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # Nearest-rank, so the reported value is always an observed latency.
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, seed: int
+) -> Dict[str, float]:
+    latencies   : List[float] = []
+    errors      = 0
+    remaining   = requests
+
+    async def worker(rng: random.Random) -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining  -= 1
+            started     = time.perf_counter()
+            try:
+                response = await scenario(client, rng)
+            except Exception:
+                # e.g. "database is locked" from concurrent SQLite writers.
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed + n)) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests'  :   requests,
+        'errors'    :   errors,
+        'rps'       :   (requests - errors) / elapsed,
+        'p50_ms'    :   percentile(latencies, 0.50) * 1000,
+        'p95_ms'    :   percentile(latencies, 0.95) * 1000,
+        'p99_ms'    :   percentile(latencies, 0.99) * 1000,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[str]:
+    print(f'\n{"scenario":<32} {"rps":>10} {"Δ rps":>8} {"p99 ms":>10} {"Δ p99":>8}')
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        rps_change = result['rps'] / before['rps'] - 1
+        p99_change = result['p99_ms'] / before['p99_ms'] - 1 if before['p99_ms'] else 0.0
+        regressed  = rps_change < -threshold or p99_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f'{name:<32} {result["rps"]:>10.1f} {rps_change:>+8.1%} '
+            f'{result["p99_ms"]:>10.2f} {p99_change:>+8.1%}{"  <- regression" if regressed else ""}'
+        )
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    # Both are read when the app modules are imported.
+    os.environ['DATABASE_URL']          = f'sqlite:///{args.database}'
+    os.environ['RATE_LIMIT_ENABLED']    = '0'
+
+    import app as posts_app
+    from common.cache import LRUTTLCache
+    from database import sqlalchemy_engine
+    from models import comments, posts
+
+    if args.no_cache:
+        posts_app.post_cache        = LRUTTLCache(maxsize=0)
+        posts_app.post_list_cache   = LRUTTLCache(maxsize=0)
+
+    await posts_app.app.router.startup()
+    started = time.perf_counter()
+    seed(sqlalchemy_engine, posts, comments, args)
+    print(f'seeded {args.posts} posts, {args.posts * args.comments} comments in {time.perf_counter() - started:.1f}s')
+
+    scenarios   = build_scenarios(args)
+    results     : Dict[str, Dict[str, float]] = {}
+    transport   = httpx.ASGITransport(app=posts_app.app)
+    print(f'\n{"scenario":<32} {"rps":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for concurrency in args.concurrency:
+                for name, scenario in scenarios.items():
+                    # A few unmeasured requests so lazy imports and pools are warm.
+                    await run_scenario(client, scenario, min(20, args.requests), 1, args.seed)
+                    key             = f'{name} c={concurrency}'
+                    result          = await run_scenario(client, scenario, args.requests, concurrency, args.seed)
+                    results[key]    = result
+                    print(
+                        f'{key:<32} {result["rps"]:>10.1f} {result["p50_ms"]:>9.2f} '
+                        f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} {result["errors"]:>7}'
+                    )
+    finally:
+        await posts_app.app.router.shutdown()
+
+    report = {
+        'meta'      :   {
+            'created'       :   datetime.now().isoformat(timespec='seconds'),
+            'python'        :   platform.python_version(),
+            'platform'      :   platform.platform(),
+            'posts'         :   args.posts,
+            'comments'      :   args.comments,
+            'requests'      :   args.requests,
+            'seed'          :   args.seed,
+            'cache'         :   not args.no_cache,
+        },
+        'results'   :   results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f'\nwrote {args.output}')
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} scenario(s) regressed by more than {args.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    # app.py imports the shared `common` package from the repository root.
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+    sys.exit(asyncio.run(main(parse_args())))
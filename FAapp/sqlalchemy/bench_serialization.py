@@ -0,0 +1,80 @@
+"""Micro-benchmark: validated vs trusted row-to-response serialization.
+
+Run from this directory with `python bench_serialization.py`. The validated
+path is what list_posts did before the fast path: PostDB(**row) for each row,
+then FastAPI's response_model validation and jsonable_encoder, then
+JSONResponse. The trusted path is construct() plus TrustedJSONResponse.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models import PostDB
+from responses import TrustedJSONResponse
+
+
+SIZES       = (10, 100, 1000)
+REPEAT      = 5
+MIN_SECONDS = 0.2
+
+page_field  = create_response_field(name='bench_page', type_=List[PostDB])
+
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    start = datetime(2023, 1, 1)
+    return [
+        {
+            'id'                :   id,
+            'publication_date'  :   start + timedelta(minutes=id),
+            'title'             :   f'Post {id}',
+            'content'           :   'Lorem ipsum dolor sit amet. ' * 8,
+            'comment_count'     :   id % 7,
+        }
+        for id in range(1, count + 1)
+    ]
+
+
+async def validated(rows: List[Dict[str, Any]]) -> bytes:
+    page    = [PostDB(**row) for row in rows]
+    content = await serialize_response(field=page_field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def trusted(rows: List[Dict[str, Any]]) -> bytes:
+    page = [PostDB.construct(**row) for row in rows]
+    return TrustedJSONResponse(page).body
+
+
+async def best_per_call(
+    function: Callable[[List[Dict[str, Any]]], Awaitable[bytes]], rows: List[Dict[str, Any]]
+) -> float:
+    best = float('inf')
+    for _ in range(REPEAT):
+        calls   = 0
+        started = time.perf_counter()
+        while True:
+            await function(rows)
+            calls  += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_SECONDS:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+async def main() -> None:
+    print(f'{"rows":>6} {"validated (ms)":>16} {"trusted (ms)":>14} {"speedup":>9}')
+    for size in SIZES:
+        rows = make_rows(size)
+        assert await validated(rows) and await trusted(rows)
+        slow = await best_per_call(validated, rows)
+        fast = await best_per_call(trusted, rows)
+        print(f'{size:>6} {slow * 1000:>16.3f} {fast * 1000:>14.3f} {slow / fast:>8.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple, Type
+
+import sqlalchemy
+from databases import Database
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+from models import comments, posts, BulkItemResult, CommentCreate, PostCreate
+
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+# Rows per execute_many call.
+BULK_BATCH_SIZE      = 500
+# Larger bodies or more items are refused with a 413.
+BULK_MAX_BYTES       = int(os.environ.get('BULK_MAX_BYTES', 8 * 1024 * 1024))
+BULK_MAX_ITEMS       = int(os.environ.get('BULK_MAX_ITEMS', 10_000))
+
+
+class BulkBodyError(ValueError):
+    pass
+
+
+class BulkBodyTooLarge(BulkBodyError):
+    pass
+
+
+async def _stream_body(request: Request) -> AsyncIterator[bytes]:
+    # Content-Length is only a hint; the bytes are counted as they arrive.
+    declared = request.headers.get('content-length', '')
+    if declared.isdigit() and int(declared) > BULK_MAX_BYTES:
+        raise BulkBodyTooLarge(f'Request body exceeds the maximum size of {BULK_MAX_BYTES} bytes')
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > BULK_MAX_BYTES:
+            raise BulkBodyTooLarge(f'Request body exceeds the maximum size of {BULK_MAX_BYTES} bytes')
+        yield chunk
+
+
+async def read_bulk_items(request: Request) -> AsyncIterator[Tuple[Any, Any]]:
+    """Yield `(item, error)` pairs from a JSON array or an NDJSON body.
+
+    NDJSON is decoded line by line as the body streams in, so a bad line only
+    fails that item. A JSON body that isn't an array raises BulkBodyError; a
+    body over BULK_MAX_BYTES raises BulkBodyTooLarge.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        buffer = bytearray()
+        async for chunk in _stream_body(request):
+            buffer.extend(chunk)
+            *lines, rest = buffer.split(b'\n')
+            buffer = bytearray(rest)
+            for line in lines:
+                if line.strip():
+                    yield _decode_line(line)
+        if buffer.strip():
+            yield _decode_line(bytes(buffer))
+        return
+
+    raw = bytearray()
+    async for chunk in _stream_body(request):
+        raw.extend(chunk)
+    try:
+        body = json.loads(raw)
+    except ValueError as e:
+        raise BulkBodyError(f'Invalid JSON body: {e}') from e
+    if not isinstance(body, list):
+        raise BulkBodyError('Expected a JSON array or an NDJSON body')
+    for item in body:
+        yield item, None
+
+
+def _decode_line(line: bytes) -> Tuple[Any, Any]:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f'Invalid JSON: {e}'
+
+
+async def validate_bulk_items(
+    request: Request, model: Type[BaseModel]
+) -> Tuple[List[BulkItemResult], List[Tuple[int, BaseModel]]]:
+    results : List[BulkItemResult]          = []
+    valid   : List[Tuple[int, BaseModel]]   = []
+    index = 0
+    async for item, error in read_bulk_items(request):
+        if index == BULK_MAX_ITEMS:
+            raise BulkBodyTooLarge(f'Request has more than the maximum of {BULK_MAX_ITEMS} items')
+        results.append(BulkItemResult(index=index))
+        if error is None:
+            try:
+                valid.append((index, model.parse_obj(item)))
+            except ValidationError as e:
+                error = e.errors()
+        results[index].error = error
+        index += 1
+    return results, valid
+
+
+async def insert_rows(database: Database, table: sqlalchemy.Table, rows: Sequence[Dict[str, Any]]) -> List[int]:
+    """Insert `rows` with one execute_many per chunk; return their ids in order.
+
+    Must run inside a transaction. SQLite gives the rows of a chunk
+    consecutive rowids, and no other writer can get in while this one holds
+    the write lock, so the ids are the range ending at max(id). Other
+    backends return them from a multi-row INSERT ... RETURNING.
+    """
+    ids : List[int] = []
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        chunk = rows[start:start + BULK_BATCH_SIZE]
+        if database.url.dialect == 'sqlite':
+            await database.execute_many(table.insert(), list(chunk))
+            last_id = await database.fetch_val(sqlalchemy.select(sqlalchemy.func.max(table.c.id)))
+            ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+        else:
+            inserted = await database.fetch_all(table.insert().values(list(chunk)).returning(table.c.id))
+            ids.extend(row['id'] for row in inserted)
+    return ids
+
+
+async def insert_posts(database: Database, new_posts: Sequence[PostCreate]) -> List[int]:
+    if not new_posts:
+        return []
+    async with database.transaction():
+        return await insert_rows(database, posts, [post.dict() for post in new_posts])
+
+
+async def insert_comments(
+    database: Database, new_comments: Sequence[CommentCreate]
+) -> List[Dict[str, Any]]:
+    """Insert comments whose post exists, in one transaction.
+
+    Post existence for the whole batch is checked with a single IN query.
+    Returns one `{'id': ...}` or `{'error': ...}` per input comment, in order.
+    """
+    if not new_comments:
+        return []
+    post_ids = {comment.post_id for comment in new_comments}
+    async with database.transaction():
+        existing_query  = sqlalchemy.select(posts.c.id).where(posts.c.id.in_(post_ids))
+        existing_ids    = {row['id'] for row in await database.fetch_all(existing_query)}
+
+        accepted    = [comment for comment in new_comments if comment.post_id in existing_ids]
+        comment_ids = iter(await insert_rows(database, comments, [comment.dict() for comment in accepted]))
+        outcomes    = [
+            {'id': next(comment_ids)} if comment.post_id in existing_ids
+            else {'error': f'Post {comment.post_id} does not exist'}
+            for comment in new_comments
+        ]
+        added       : Counter[int] = Counter(comment.post_id for comment in accepted)
+
+        # databases binds execute_many values as column values, so the
+        # increment is written as a textual statement with named parameters.
+        updated_at  = datetime.now()
+        await database.execute_many(
+            'UPDATE posts SET comment_count = comment_count + :added, updated_at = :updated_at '
+            'WHERE id = :target_id',
+            [
+                {'target_id': post_id, 'added': count, 'updated_at': updated_at}
+                for post_id, count in added.items()
+            ],
+        )
+    return outcomes
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from databases import Database
+from pydantic import BaseSettings
+from common.cache import LRUTTLCache
+from bulk import insert_comments
+from models import CommentCreate
+
+
+logger = logging.getLogger(__name__)
+
+
+class CommentQueueSettings(BaseSettings):
+    # Opt-in: POST /comments answers 202 and the comment is written later,
+    # in batches, by a background task.
+    enabled         :   bool    =   False
+    maxsize         :   int     =   10_000
+    batch_size      :   int     =   500
+    # Longest a queued comment waits for its batch to fill up.
+    flush_interval  :   float   =   0.05
+    # How long a request waits for room in a full queue before a 503.
+    put_timeout     :   float   =   1.0
+    # A batch that fails (e.g. SQLite "database is locked" while another
+    # writer holds the lock) is retried with exponential backoff.
+    flush_retries   :   int     =   3
+    retry_delay     :   float   =   0.1
+    # Outcomes stay available to GET /comments/queued/{ticket} this long.
+    outcome_ttl     :   float   =   300.0
+
+    class Config:
+        env_prefix = 'COMMENT_QUEUE_'
+
+
+comment_queue_settings = CommentQueueSettings()
+
+Flushed = Callable[[Sequence[Tuple[CommentCreate, Dict[str, Any]]]], Awaitable[None]]
+
+
+class CommentQueueFull(Exception):
+    pass
+
+
+class CommentQueue:
+    """Bounded write-behind queue for new comments.
+
+    `submit` only enqueues and hands back a ticket. A single worker takes up
+    to `batch_size` comments, or whatever arrived within `flush_interval` of
+    the first one, and writes them with `insert_comments` in one
+    transaction, so a burst costs one write transaction per batch instead of
+    one per comment. `on_flushed` runs after every batch (cache
+    invalidation, notifications). `stop` refuses new comments and returns
+    once everything already queued is written.
+    """
+
+    def __init__(
+        self,
+        database        :   Callable[[], Database],
+        on_flushed      :   Optional[Flushed]       = None,
+        settings        :   CommentQueueSettings    = comment_queue_settings,
+    ):
+        self.database   = database
+        self.on_flushed = on_flushed
+        self.settings   = settings
+        self.outcomes   = LRUTTLCache(maxsize=settings.maxsize * 4, ttl=settings.outcome_ttl)
+        self._pending   : Dict[str, CommentCreate] = {}
+        self._queue     : Optional['asyncio.Queue[Optional[Tuple[str, CommentCreate]]]'] = None
+        self._worker    : Optional['asyncio.Task[None]'] = None
+        self._closing   = False
+
+    async def start(self) -> None:
+        self._closing   = False
+        self._queue     = asyncio.Queue(maxsize=self.settings.maxsize)
+        self._worker    = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None or self._queue is None:
+            return
+        self._closing = True
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+        # Requests that were already waiting for room when stop() began.
+        leftovers = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                leftovers.append(item)
+        if leftovers:
+            await self._flush(leftovers)
+
+    async def submit(self, comment: CommentCreate) -> str:
+        if self._queue is None or self._closing:
+            raise CommentQueueFull('Comment queue is not accepting comments')
+        ticket = uuid.uuid4().hex
+        # Registered first: the worker may flush it before put() returns.
+        self._pending[ticket] = comment
+        try:
+            await asyncio.wait_for(self._queue.put((ticket, comment)), self.settings.put_timeout)
+        except asyncio.TimeoutError:
+            del self._pending[ticket]
+            raise CommentQueueFull('Comment queue is full')
+        return ticket
+
+    def status(self, ticket: str) -> Optional[Dict[str, Any]]:
+        if ticket in self._pending:
+            return {'status': 'queued'}
+        return self.outcomes.get(ticket)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _next_batch(self) -> Tuple[List[Tuple[str, CommentCreate]], bool]:
+        assert self._queue is not None
+        batch   : List[Tuple[str, CommentCreate]] = []
+        item    = await self._queue.get()
+        if item is None:
+            return batch, True
+        batch.append(item)
+        deadline = asyncio.get_running_loop().time() + self.settings.flush_interval
+        while len(batch) < self.settings.batch_size:
+            if self._queue.empty():
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, CommentCreate]]) -> None:
+        new_comments    = [comment for _, comment in batch]
+        results         : List[Dict[str, Any]] = []
+        for attempt in range(self.settings.flush_retries + 1):
+            try:
+                results = await insert_comments(self.database(), new_comments)
+                break
+            except Exception:
+                if attempt == self.settings.flush_retries:
+                    logger.exception('Writing %d queued comments failed', len(batch))
+                    results = [{'error': 'Comment could not be saved'}] * len(batch)
+                else:
+                    await asyncio.sleep(self.settings.retry_delay * 2 ** attempt)
+        for (ticket, _), result in zip(batch, results):
+            self._pending.pop(ticket, None)
+            self.outcomes.put(ticket, dict(result, status='failed' if 'error' in result else 'created'))
+        if self.on_flushed is not None:
+            try:
+                await self.on_flushed(list(zip(new_comments, results)))
+            except Exception:
+                logger.exception('Post-flush hook failed')
@@ -0,0 +1,20 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+# Opaque keyset cursors: the (publication_date, id) of the last row of a page,
+# JSON-encoded then base64url'd so clients treat them as a token.
+def encode_cursor(publication_date: datetime, id: int) -> str:
+    payload = json.dumps([publication_date.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded                  = cursor + '=' * (-len(cursor) % 4)
+        raw_date, id            = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(raw_date), int(id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
@@ -1,12 +1,118 @@
 
+import sqlite3
+from typing import Any, Dict, Optional, Type
+
 import sqlalchemy
 from databases import Database
+from pydantic import BaseSettings
+from common.metrics import InstrumentedDatabase
+
+
+class DatabaseSettings(BaseSettings):
+    url                 :   str             =   'sqlite:///application.db'
+    # A separate URL for reads (e.g. a replica). With SQLite, `read_pool`
+    # opens a second, read-only pool on `url` instead.
+    read_url            :   Optional[str]   =   None
+    read_pool           :   bool            =   False
+    min_size            :   int             =   1
+    max_size            :   int             =   10
+    # SQLite only: applied to every new connection when enabled.
+    sqlite_pragmas      :   bool            =   False
+    sqlite_synchronous  :   str             =   'NORMAL'
+    sqlite_mmap_size    :   int             =   256 * 1024 * 1024
+    sqlite_cache_size   :   int             =   -64 * 1024
+    sqlite_busy_timeout :   int             =   5000
+    # With or without the pragmas, write transactions take the write lock
+    # up front (BEGIN IMMEDIATE) and wait out the busy timeout for it,
+    # instead of failing with "database is locked" when a read inside them
+    # is upgraded after another commit.
+    sqlite_immediate    :   bool            =   True
+
+    class Config:
+        env_prefix = 'DATABASE_'
+
+
+settings = DatabaseSettings()
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith('sqlite')
+
+
+def sqlite_pragmas(settings: DatabaseSettings, read_only: bool = False) -> Dict[str, Any]:
+    pragmas: Dict[str, Any] = {}
+    if settings.sqlite_pragmas:
+        pragmas.update({
+            'journal_mode'  :   'WAL',
+            'synchronous'   :   settings.sqlite_synchronous,
+            'mmap_size'     :   settings.sqlite_mmap_size,
+            'cache_size'    :   settings.sqlite_cache_size,
+            'busy_timeout'  :   settings.sqlite_busy_timeout,
+        })
+    if read_only:
+        pragmas['query_only'] = 'ON'
+    return pragmas
 
 
-DATABASE_URL = 'sqlite:///application.db'
-database = Database(DATABASE_URL)
-sqlalchemy_engine = sqlalchemy.create_engine(DATABASE_URL)
+def sqlite_connection_factory(pragmas: Dict[str, Any], immediate: bool = False) -> Type[sqlite3.Connection]:
+    # aiosqlite forwards extra options to sqlite3.connect, so a Connection
+    # subclass is the one hook that runs on every connection the pool opens.
+    class PragmaConnection(sqlite3.Connection):
+        def __init__(self, *args: Any, **kwargs: Any):
+            super().__init__(*args, **kwargs)
+            for name, value in pragmas.items():
+                self.execute(f'PRAGMA {name} = {value}')
+
+        def execute(self, sql: str, *args: Any) -> sqlite3.Cursor:
+            # databases starts every transaction with a plain "BEGIN".
+            if immediate and sql == 'BEGIN':
+                sql = 'BEGIN IMMEDIATE'
+            return super().execute(sql, *args)
+
+    return PragmaConnection
+
+
+def create_database(url: str, settings: DatabaseSettings, read_only: bool = False) -> Database:
+    if is_sqlite(url):
+        pragmas = sqlite_pragmas(settings, read_only)
+        # The writer always gets the factory: read-then-write transactions
+        # hit "database is locked" under concurrent writers with or without
+        # the pragmas (sqlite3's own 5s busy timeout covers the wait then).
+        immediate = settings.sqlite_immediate and not read_only
+        options   = {'factory': sqlite_connection_factory(pragmas, immediate)} if pragmas or immediate else {}
+    else:
+        options = {'min_size': settings.min_size, 'max_size': settings.max_size}
+    # Query counts and timings feed the /metrics endpoint.
+    return InstrumentedDatabase(Database(url, **options))
+
+
+def create_sqlalchemy_engine(settings: DatabaseSettings) -> sqlalchemy.engine.Engine:
+    engine  = sqlalchemy.create_engine(settings.url)
+    pragmas = sqlite_pragmas(settings) if is_sqlite(settings.url) else {}
+    if pragmas:
+        @sqlalchemy.event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.close()
+    return engine
+
+
+DATABASE_URL = settings.url
+database = create_database(DATABASE_URL, settings)
+if settings.read_url is not None:
+    read_database = create_database(settings.read_url, settings, read_only=is_sqlite(settings.read_url))
+elif settings.read_pool:
+    read_database = create_database(DATABASE_URL, settings, read_only=True)
+else:
+    read_database = database
+sqlalchemy_engine = create_sqlalchemy_engine(settings)
 
 
 def get_database() -> Database:
-    return database
\ No newline at end of file
+    return database
+
+
+def get_read_database() -> Database:
+    return read_database
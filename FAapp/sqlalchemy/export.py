@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List
+
+from databases import Database
+from models import comments, posts
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+class ExportFormat(str, Enum):
+    NDJSON  = 'ndjson'
+    CSV     = 'csv'
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON :   'application/x-ndjson',
+    ExportFormat.CSV    :   'text/csv',
+}
+
+POST_COLUMNS    = [column.name for column in posts.c]
+COMMENT_COLUMNS = ['id', 'publication_date', 'content']
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+async def iter_posts(
+    database: Database, with_comments: bool, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield posts in id order, `chunk_size` at a time.
+
+    Each chunk is one keyset query on posts.id, plus one IN query for the
+    chunk's comments when `with_comments` is set, so only one chunk is ever
+    held in memory.
+    """
+    last_id = 0
+    while True:
+        select_query    = (
+            posts.select()
+            .where(posts.c.id > last_id)
+            .order_by(posts.c.id)
+            .limit(chunk_size)
+        )
+        rows            = await database.fetch_all(select_query)
+        if not rows:
+            return
+        chunk           = [{name: row[name] for name in POST_COLUMNS} for row in rows]
+        last_id         = chunk[-1]['id']
+
+        if with_comments:
+            by_post : Dict[int, List[Dict[str, Any]]] = {post['id']: [] for post in chunk}
+            select_comments_query = (
+                comments.select()
+                .where(comments.c.post_id.in_(list(by_post)))
+                .order_by(comments.c.post_id, comments.c.id)
+            )
+            for comment in await database.fetch_all(select_comments_query):
+                by_post[comment['post_id']].append(
+                    {name: comment[name] for name in COMMENT_COLUMNS}
+                )
+            for post in chunk:
+                post['comments'] = by_post[post['id']]
+        yield chunk
+
+
+async def ndjson_export(
+    database: Database, with_comments: bool, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    async for chunk in iter_posts(database, with_comments, chunk_size):
+        yield b''.join(
+            json.dumps(post, default=_json_default).encode() + b'\n' for post in chunk
+        )
+
+
+async def csv_export(
+    database: Database, with_comments: bool, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    # One CSV row per comment, with the post columns repeated; posts without
+    # comments get a single row with empty comment columns.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = list(POST_COLUMNS)
+    if with_comments:
+        header += [f'comment_{name}' for name in COMMENT_COLUMNS]
+    writer.writerow(header)
+
+    async for chunk in iter_posts(database, with_comments, chunk_size):
+        for post in chunk:
+            post_values = [post[name] for name in POST_COLUMNS]
+            if not with_comments:
+                writer.writerow(post_values)
+                continue
+            for comment in post['comments'] or [{}]:
+                writer.writerow(post_values + [comment.get(name) for name in COMMENT_COLUMNS])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
@@ -0,0 +1,63 @@
+from typing import AsyncIterator, Iterable, Optional
+
+from databases import Database
+from common.broker import Broker, BrokerEvent, Subscription
+from models import comments, CommentDB
+
+
+FEED_KEEPALIVE      = 15.0
+FEED_REPLAY_BATCH   = 500
+
+# Topics are post ids; event ids are comment ids, so they only ever grow and
+# a client can resume from one across reconnects and server restarts.
+comment_broker = Broker()
+
+
+def publish_comments(new_comments: Iterable[CommentDB]) -> None:
+    for comment in new_comments:
+        comment_broker.publish(comment.post_id, BrokerEvent(comment.id, 'comment', comment.json()))
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    if value is None or not value.strip().isdigit():
+        return None
+    return int(value)
+
+
+async def comment_events(
+    database        :   Database,
+    post_id         :   int,
+    subscription    :   Subscription,
+    last_event_id   :   Optional[int]   = None,
+    keepalive       :   float           = FEED_KEEPALIVE,
+) -> AsyncIterator[Optional[BrokerEvent]]:
+    """Comments on a post after `last_event_id`, then live ones as they come.
+
+    The caller subscribes first, so nothing published while the backlog is
+    read from the database is missed; ids already sent are skipped. Yields
+    None every `keepalive` seconds without events. Ends with
+    SubscriptionClosed if the subscriber falls too far behind.
+    """
+    sent = last_event_id
+    while sent is not None:
+        query = (
+            comments.select()
+            .where(comments.c.post_id == post_id, comments.c.id > sent)
+            .order_by(comments.c.id)
+            .limit(FEED_REPLAY_BATCH)
+        )
+        rows = await database.fetch_all(query)
+        for row in rows:
+            comment = CommentDB.construct(**row)
+            sent    = comment.id
+            yield BrokerEvent(comment.id, 'comment', comment.json())
+        if len(rows) < FEED_REPLAY_BATCH:
+            break
+
+    while True:
+        event = await subscription.next(timeout=keepalive)
+        if event is not None and sent is not None and event.id <= sent:
+            continue
+        if event is not None:
+            sent = event.id
+        yield event
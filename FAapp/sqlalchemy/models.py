@@ -1,7 +1,7 @@
 
 import sqlalchemy
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -29,12 +29,24 @@ class PostCreate(PostBase):
     pass
 
 class PostDB(PostBase):
-    id     :    int
+    id              :   int
+    comment_count   :   int                 =   0
+    updated_at      :   Optional[datetime]  =   None
 
 
 class PostPublic(PostDB):
     comments :    List[CommentDB]
 
+class PostSearchResult(PostDB):
+    rank            :   float
+    title_snippet   :   str
+    content_snippet :   str
+
+class BulkItemResult(BaseModel):
+    index   :   int
+    id      :   Optional[int]   =   None
+    error   :   Optional[Any]   =   None
+
 metadata = sqlalchemy.MetaData()
 
 posts = sqlalchemy.Table(
@@ -44,6 +56,9 @@ posts = sqlalchemy.Table(
     sqlalchemy.Column('publication_date', sqlalchemy.DateTime(), nullable=False),
     sqlalchemy.Column('title', sqlalchemy.String(length=255), nullable=False),
     sqlalchemy.Column('content', sqlalchemy.Text(), nullable=False),
+    sqlalchemy.Column('comment_count', sqlalchemy.Integer, nullable=False, server_default='0'),
+    sqlalchemy.Column('updated_at', sqlalchemy.DateTime(), nullable=True),
+    sqlalchemy.Index('ix_posts_publication_date_id', 'publication_date', 'id'),
 )
 
 comments = sqlalchemy.Table(
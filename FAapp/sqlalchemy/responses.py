@@ -0,0 +1,53 @@
+from typing import Any, Dict, Optional, Type, TypeVar
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, BaseSettings
+
+
+class ResponseSettings(BaseSettings):
+    # Opt-in: rows read back from our own database are trusted, so models are
+    # built with construct() (no validation) and returned as a
+    # TrustedJSONResponse, which also skips FastAPI's response_model pass.
+    fast_responses  :   bool    =   False
+
+    class Config:
+        env_prefix = 'APP_'
+
+
+response_settings = ResponseSettings()
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+
+def _default(value: Any) -> Any:
+    # Models built with construct() hold their raw field values in __dict__;
+    # nested models come back through here as well.
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class TrustedJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def build_model(model: Type[ModelT], **values: Any) -> ModelT:
+    if response_settings.fast_responses:
+        return model.construct(**values)
+    return model(**values)
+
+
+def respond(content: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+    # On the model path the caller sets `headers` on its injected Response.
+    if response_settings.fast_responses:
+        return TrustedJSONResponse(content, headers=headers)
+    return content
+
+
+def render_json(content: Any) -> bytes:
+    if response_settings.fast_responses:
+        return orjson.dumps(content, default=_default)
+    return JSONResponse(jsonable_encoder(content)).body
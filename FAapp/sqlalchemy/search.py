@@ -0,0 +1,110 @@
+import html
+import re
+from typing import List, Optional
+
+import sqlalchemy
+from databases import Database
+from models import PostSearchResult
+
+
+# FTS5 external-content index over posts.title and posts.content, kept in
+# sync by triggers so every write path (including bulk inserts and ad-hoc
+# SQL) updates it incrementally. The a7e2c4d91f38 migration has its own copy.
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content, content='posts', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+# Title matches weigh more than content matches in the bm25 ranking.
+SEARCH_QUERY = """
+    SELECT
+        posts.*,
+        bm25(posts_fts, 10.0, 1.0)                              AS rank,
+        snippet(posts_fts, 0, :open, :close, '...', 12)         AS title_snippet,
+        snippet(posts_fts, 1, :open, :close, '...', 24)         AS content_snippet
+    FROM posts_fts
+    JOIN posts ON posts.id = posts_fts.rowid
+    WHERE posts_fts MATCH :match
+    ORDER BY rank
+    LIMIT :limit
+"""
+
+HIGHLIGHT_OPEN  = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+# snippet() copies the raw post text, so it brackets matches with control
+# characters; the text is HTML-escaped first and only then are those turned
+# into the highlight tags. At worst a post that contains them itself gets a
+# stray <mark>, never markup of its own.
+SNIPPET_OPEN    = '\x02'
+SNIPPET_CLOSE   = '\x03'
+
+
+def ensure_search_index(engine: sqlalchemy.engine.Engine) -> None:
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as connection:
+        exists = connection.execute(sqlalchemy.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+        )).first()
+        for statement in FTS_DDL:
+            connection.execute(sqlalchemy.text(statement))
+        if exists is None:
+            connection.execute(sqlalchemy.text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+
+
+def highlight(snippet: str) -> str:
+    escaped = html.escape(snippet)
+    return escaped.replace(SNIPPET_OPEN, HIGHLIGHT_OPEN).replace(SNIPPET_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def build_match_query(q: str) -> Optional[str]:
+    # Every word is quoted so user input can't inject FTS5 operators; the
+    # terms are ANDed together.
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+async def search_posts(database: Database, q: str, limit: int) -> List[PostSearchResult]:
+    match = build_match_query(q)
+    if match is None:
+        return []
+    rows = await database.fetch_all(
+        SEARCH_QUERY,
+        values={
+            'match' :   match,
+            'limit' :   limit,
+            'open'  :   SNIPPET_OPEN,
+            'close' :   SNIPPET_CLOSE,
+        },
+    )
+    return [
+        PostSearchResult(**{
+            **row,
+            'title_snippet'     :   highlight(row['title_snippet']),
+            'content_snippet'   :   highlight(row['content_snippet']),
+        })
+        for row in rows
+    ]
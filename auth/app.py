@@ -1,3 +1,75 @@
+import os
 
+from fastapi import FastAPI, HTTPException, status
+from tortoise.contrib.fastapi import register_tortoise
+from tortoise.exceptions import IntegrityError
+from bloom import ScalableBloomFilter
+from models import User, UserCreate, UserTortoise
+from password import get_password_hash_async, shutdown_executor
 
-@app.post("/register", status_code)
\ No newline at end of file
+AUTH_DATABASE_URL = os.environ.get('AUTH_DATABASE_URL', 'sqlite://auth.db')
+REGISTERED_EMAILS_CAPACITY      = int(os.environ.get('REGISTERED_EMAILS_CAPACITY', 100_000))
+REGISTERED_EMAILS_ERROR_RATE    = float(os.environ.get('REGISTERED_EMAILS_ERROR_RATE', 0.001))
+REGISTERED_EMAILS_BATCH         = 10_000
+
+app = FastAPI()
+
+register_tortoise(
+    app,
+    db_url              =   AUTH_DATABASE_URL,
+    modules             =   {'models': ['models']},
+    generate_schemas    =   True,
+    add_exception_handlers  =   True,
+)
+
+# Every email in the users table, as a Bloom filter: an email it doesn't
+# contain is certainly new, so registration skips the lookup for it. Only
+# this process's inserts are added; one made elsewhere shows up as an
+# IntegrityError on insert instead, which is still answered with a 409.
+registered_emails = ScalableBloomFilter(REGISTERED_EMAILS_CAPACITY, REGISTERED_EMAILS_ERROR_RATE)
+
+
+async def load_registered_emails() -> ScalableBloomFilter:
+    count   = await UserTortoise.all().count()
+    emails  = ScalableBloomFilter(max(REGISTERED_EMAILS_CAPACITY, count * 2), REGISTERED_EMAILS_ERROR_RATE)
+    last_id = 0
+    while True:
+        rows = await (
+            UserTortoise.filter(id__gt=last_id)
+            .order_by('id')
+            .limit(REGISTERED_EMAILS_BATCH)
+            .values_list('id', 'email')
+        )
+        for last_id, email in rows:
+            emails.add(email)
+        if len(rows) < REGISTERED_EMAILS_BATCH:
+            return emails
+
+
+# Registered after register_tortoise(), so its startup handler has run.
+@app.on_event('startup')
+async def startup():
+    global registered_emails
+    registered_emails = await load_registered_emails()
+
+@app.on_event('shutdown')
+async def shutdown():
+    shutdown_executor()
+
+
+@app.post('/register', response_model=User, status_code=status.HTTP_201_CREATED)
+async def register(user_create: UserCreate) -> User:
+    # Duplicates are turned away before the bcrypt work; the lookup is only
+    # needed for emails the filter has (probably) seen.
+    email = user_create.email
+    if email in registered_emails and await UserTortoise.filter(email=email).exists():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Email already registered')
+
+    hashed_password = await get_password_hash_async(user_create.password)
+    try:
+        user = await UserTortoise.create(email=email, hashed_password=hashed_password)
+    except IntegrityError:
+        registered_emails.add(email)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Email already registered')
+    registered_emails.add(email)
+    return User.from_orm(user)
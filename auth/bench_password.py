@@ -0,0 +1,121 @@
+"""Registration/login throughput and latency, blocking vs off-loop hashing.
+
+Run from this directory with `python bench_password.py`. For each mode a
+small in-process app serves /register, /login and an unrelated /ping route;
+auth requests and a steady stream of pings run concurrently through an ASGI
+transport, and the ping p99 shows how long the event loop was blocked.
+Tune with PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS and
+PASSWORD_HASH_EXECUTOR.
+"""
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from fastapi import Body, FastAPI
+from password import (
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    get_password_hash,
+    get_password_hash_async,
+    shutdown_executor,
+    verify_password,
+    verify_password_async,
+)
+
+
+AUTH_REQUESTS   = 64
+CONCURRENCY     = 16
+PING_INTERVAL   = 0.005
+
+
+def build_app(off_loop: bool) -> FastAPI:
+    app     = FastAPI()
+    users   : Dict[str, str] = {}
+
+    @app.post('/register')
+    async def register(email: str = Body(...), password: str = Body(...)):
+        if off_loop:
+            users[email] = await get_password_hash_async(password)
+        else:
+            users[email] = get_password_hash(password)
+        return {'email': email}
+
+    @app.post('/login')
+    async def login(email: str = Body(...), password: str = Body(...)):
+        if off_loop:
+            valid = await verify_password_async(password, users[email])
+        else:
+            valid = verify_password(password, users[email])
+        return {'valid': valid}
+
+    @app.get('/ping')
+    async def ping():
+        return {'pong': True}
+
+    return app
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(off_loop: bool) -> None:
+    app         = build_app(off_loop)
+    semaphore   = asyncio.Semaphore(CONCURRENCY)
+    latencies   : Dict[str, List[float]] = {'register': [], 'login': [], 'ping': []}
+    done        = asyncio.Event()
+
+    async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+        async def timed(kind: str, method: str, url: str, **kwargs) -> None:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - started)
+
+        async def auth_flow(index: int) -> None:
+            credentials = {'email': f'user{index}@example.com', 'password': 'correct horse'}
+            async with semaphore:
+                await timed('register', 'POST', '/register', json=credentials)
+                await timed('login', 'POST', '/login', json=credentials)
+
+        # Ping latency is measured from when the ping was due, so time spent
+        # waiting for a blocked event loop counts against it.
+        async def pinger() -> None:
+            while not done.is_set():
+                due = time.perf_counter() + PING_INTERVAL
+                await asyncio.sleep(PING_INTERVAL)
+                response = await client.get('/ping')
+                response.raise_for_status()
+                latencies['ping'].append(time.perf_counter() - due)
+
+        ping_task   = asyncio.create_task(pinger())
+        started     = time.perf_counter()
+        await asyncio.gather(*(auth_flow(index) for index in range(AUTH_REQUESTS)))
+        elapsed     = time.perf_counter() - started
+        done.set()
+        await ping_task
+
+    mode = f'off-loop ({PASSWORD_HASH_EXECUTOR} x{PASSWORD_HASH_WORKERS})' if off_loop else 'blocking'
+    print(f'{mode}: {2 * AUTH_REQUESTS / elapsed:.1f} auth ops/s')
+    for kind, samples in latencies.items():
+        print(
+            f'  {kind:<9} n={len(samples):<5} '
+            f'p50={statistics.median(samples) * 1000:8.2f} ms  '
+            f'p99={percentile(samples, 0.99) * 1000:8.2f} ms'
+        )
+
+
+async def main() -> None:
+    print(f'bcrypt rounds={PASSWORD_HASH_ROUNDS}, {AUTH_REQUESTS} registrations + logins, '
+          f'concurrency={CONCURRENCY}')
+    await run(off_loop=False)
+    await run(off_loop=True)
+    shutdown_executor()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import hashlib
+import math
+from typing import Iterable, List
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    `in` never answers False for something that was added; it answers True
+    for something that wasn't with probability about `error_rate` while at
+    most `capacity` items are in. Positions come from one BLAKE2b digest
+    split into two 64-bit hashes (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError('capacity must be positive and error_rate in (0, 1)')
+        self.capacity   = capacity
+        self.error_rate = error_rate
+        self.size       = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes     = max(1, round(self.size / capacity * math.log(2)))
+        self.count      = 0
+        self._bits      = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> List[int]:
+        digest  = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first   = int.from_bytes(digest[:8], 'little')
+        second  = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class ScalableBloomFilter:
+    """A Bloom filter that keeps its error rate as it grows.
+
+    Once the current filter is full a new one with `growth` times the
+    capacity and a tighter error rate is added; lookups check all of them,
+    so the overall false-positive rate stays below `error_rate` without
+    ever rebuilding from the source data.
+    """
+
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, growth: int = 2):
+        self.error_rate = error_rate
+        self.growth     = growth
+        # The geometric series of per-filter rates sums to error_rate.
+        self.filters    = [BloomFilter(capacity, error_rate * (1 - self.TIGHTENING))]
+
+    def add(self, item: str) -> None:
+        current = self.filters[-1]
+        if current.full:
+            current = BloomFilter(current.capacity * self.growth, current.error_rate * self.TIGHTENING)
+            self.filters.append(current)
+        current.add(item)
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom for bloom in self.filters)
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bloom.nbytes for bloom in self.filters)
@@ -1,16 +1,72 @@
-from fastapi import Depends, FastAPI, HTTPException, status
+import hmac
+import os
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, status
 from fastapi.params import Depends
 from fastapi.security import APIKeyHeader
+from tortoise.contrib.fastapi import register_tortoise
+from common.ratelimit import RateLimit, RateLimitMiddleware
+from models import APIToken, APITokenCreate, APITokenIssued
+from tokens import TokenInfo, TokenStore
 
-API_TOKEN = 'SECRET_API_TOKEN'
+# Manages the tenant tokens below; it is not itself a tenant token. There
+# is no default: the app refuses to start without one.
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN', '')
+if not ADMIN_API_TOKEN:
+    raise RuntimeError('ADMIN_API_TOKEN must be set; it guards the /tokens admin routes')
+AUTH_DATABASE_URL = os.environ.get('AUTH_DATABASE_URL', 'sqlite://auth.db')
 
 app = FastAPI()
 
-async def api_token(token: str = Depends(APIKeyHeader(name='Token'))):
-    if token != API_TOKEN:
+token_store = TokenStore()
+
+# A token gets its own bucket once it has been verified; unknown ones count
+# against the client's address.
+app.add_middleware(RateLimitMiddleware, default=RateLimit(rate=10, burst=20), verified=token_store.is_known)
+
+async def api_token(token: str = Depends(APIKeyHeader(name='Token'))) -> TokenInfo:
+    info = await token_store.verify(token)
+    if info is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return info
+
+async def admin_token(token: str = Depends(APIKeyHeader(name='Token'))) -> None:
+    if not hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode()):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
     
 
 @app.get('/protected-route', dependencies=[Depends(api_token)])
 async def protected_route():
-    return {'hello': 'world'}
\ No newline at end of file
+    return {'hello': 'world'}
+
+
+@app.post(
+    '/tokens',
+    response_model=APITokenIssued,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admin_token)],
+)
+async def issue_token(token_create: APITokenCreate) -> APITokenIssued:
+    token, row = await token_store.issue(token_create.tenant, token_create.expires_in)
+    return APITokenIssued(**APIToken.from_orm(row).dict(), token=token)
+
+@app.get('/tokens', response_model=List[APIToken], dependencies=[Depends(admin_token)])
+async def list_tokens(tenant: Optional[str] = Query(None)) -> List[APIToken]:
+    return [APIToken.from_orm(row) for row in await token_store.list(tenant)]
+
+@app.delete('/tokens/{id}', response_model=APIToken, dependencies=[Depends(admin_token)])
+async def revoke_token(id: int) -> APIToken:
+    row = await token_store.revoke(id)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return APIToken.from_orm(row)
+
+
+register_tortoise(
+    app,
+    db_url              =   AUTH_DATABASE_URL,
+    modules             =   {'models': ['models']},
+    generate_schemas    =   True,
+    add_exception_handlers  =   True,
+)
@@ -1,4 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from tortoise import fields
+from tortoise.models import Model
 
 
 class UserBase(BaseModel):
@@ -20,7 +24,39 @@ class UserDB(User):
 class UserTortoise(Model):
     id = fields.IntField(pk=True, generate=True)
     email = fields.CharField(index=True, unique=True, null=False, max_length=255)
-    hashed_password = fields.CharField(null=False)
+    hashed_password = fields.CharField(null=False, max_length=255)
 
     class Meta:
         table = 'users'
+
+
+class APITokenCreate(BaseModel):
+    tenant      :   str             =   Field(..., min_length=1, max_length=255)
+    expires_in  :   Optional[int]   =   Field(None, gt=0, description='Lifetime in seconds')
+
+class APIToken(BaseModel):
+    id          :   int
+    tenant      :   str
+    created_at  :   datetime
+    expires_at  :   Optional[datetime]
+    revoked_at  :   Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+class APITokenIssued(APIToken):
+    token       :   str
+
+
+# Only the SHA-256 of a token is stored; the token itself is shown once, when
+# it is issued.
+class APITokenTortoise(Model):
+    id = fields.IntField(pk=True, generate=True)
+    tenant = fields.CharField(index=True, null=False, max_length=255)
+    token_hash = fields.CharField(index=True, unique=True, null=False, max_length=64)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(null=True)
+    revoked_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = 'api_tokens'
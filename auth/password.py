@@ -1,6 +1,54 @@
-from passlib.context import CryptoContext
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
 
-pwd_context = CryptoContext(schemes=['bcrypt'], deprecated='auto')
+from passlib.context import CryptContext
+
+PASSWORD_HASH_ROUNDS    = int(os.environ.get('PASSWORD_HASH_ROUNDS', 12))
+PASSWORD_HASH_WORKERS   = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+# 'thread' is enough for bcrypt, which releases the GIL while hashing;
+# 'process' also isolates the pure-Python parts of passlib.
+PASSWORD_HASH_EXECUTOR  = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+
+pwd_context = CryptContext(
+    schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=PASSWORD_HASH_ROUNDS
+)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+_executor: Optional[Executor] = None
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == 'process':
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash'
+            )
+    return _executor
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+# Async variants for routes: the bcrypt work runs on the pool so the event
+# loop keeps serving other requests meanwhile.
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), verify_password, plain_password, hashed_password
+    )
@@ -0,0 +1,119 @@
+import hashlib
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from tortoise import timezone
+from common.cache import LRUTTLCache
+from models import APITokenTortoise
+
+
+TOKEN_CACHE_SIZE            = 10_000
+TOKEN_CACHE_TTL             = 60.0
+# Unknown tokens get their own, smaller cache: a flood of random tokens
+# then evicts other unknown ones, never the valid tokens.
+TOKEN_NEGATIVE_CACHE_SIZE   = 2_000
+TOKEN_NEGATIVE_CACHE_TTL    = 10.0
+
+
+def hash_token(token: str) -> str:
+    # Tokens are 256 random bits, so a plain SHA-256 is enough; a slow KDF
+    # would defeat the point of a per-request check.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class TokenInfo:
+    id          :   int
+    tenant      :   str
+    token_hash  :   str
+    expires_at  :   Optional[datetime]
+    revoked     :   bool
+
+    def is_active(self, now: datetime) -> bool:
+        return not self.revoked and (self.expires_at is None or self.expires_at > now)
+
+
+class TokenStore:
+    """API tokens hashed in the api_tokens table, behind a bounded LRU cache.
+
+    A steady-state check is a SHA-256 and one dict lookup. The lookup key
+    is the hash itself, so there is no secret left to compare in constant
+    time: timing it could at most reveal a prefix of a cached hash, which
+    doesn't help to find a token. Revoking through this store drops the
+    cache entry at once; other processes see it once their entry's TTL
+    runs out.
+    """
+
+    def __init__(
+        self,
+        cache_size          :   int     = TOKEN_CACHE_SIZE,
+        cache_ttl           :   float   = TOKEN_CACHE_TTL,
+        negative_cache_size :   int     = TOKEN_NEGATIVE_CACHE_SIZE,
+        negative_cache_ttl  :   float   = TOKEN_NEGATIVE_CACHE_TTL,
+    ):
+        self.cache      = LRUTTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Hashes the database doesn't know, so repeated bad tokens don't
+        # reach it either.
+        self.unknown    = LRUTTLCache(maxsize=negative_cache_size, ttl=negative_cache_ttl)
+
+    @staticmethod
+    def _info(row: APITokenTortoise) -> TokenInfo:
+        return TokenInfo(
+            id          =   row.id,
+            tenant      =   row.tenant,
+            token_hash  =   row.token_hash,
+            expires_at  =   row.expires_at,
+            revoked     =   row.revoked_at is not None,
+        )
+
+    async def issue(
+        self, tenant: str, expires_in: Optional[int] = None
+    ) -> Tuple[str, APITokenTortoise]:
+        token       = secrets.token_urlsafe(32)
+        expires_at  = timezone.now() + timedelta(seconds=expires_in) if expires_in else None
+        row         = await APITokenTortoise.create(
+            tenant=tenant, token_hash=hash_token(token), expires_at=expires_at
+        )
+        self.unknown.invalidate(row.token_hash)
+        self.cache.put(row.token_hash, self._info(row))
+        return token, row
+
+    async def revoke(self, id: int) -> Optional[APITokenTortoise]:
+        row = await APITokenTortoise.get_or_none(id=id)
+        if row is None:
+            return None
+        if row.revoked_at is None:
+            row.revoked_at = timezone.now()
+            await row.save(update_fields=['revoked_at'])
+        self.cache.invalidate(row.token_hash)
+        return row
+
+    async def list(self, tenant: Optional[str] = None) -> List[APITokenTortoise]:
+        query = APITokenTortoise.all().order_by('id')
+        if tenant is not None:
+            query = query.filter(tenant=tenant)
+        return await query
+
+    def is_known(self, token: str) -> bool:
+        # Cache-only, for synchronous callers (the rate limiter): an active
+        # token verify() has seen recently.
+        info = self.cache.get(hash_token(token))
+        return info is not None and info.is_active(timezone.now())
+
+    async def verify(self, token: str) -> Optional[TokenInfo]:
+        token_hash  = hash_token(token)
+        info        = self.cache.get(token_hash)
+        if info is None:
+            if self.unknown.get(token_hash) is not None:
+                return None
+            epoch           = self.cache.epoch
+            unknown_epoch   = self.unknown.epoch
+            row             = await APITokenTortoise.get_or_none(token_hash=token_hash)
+            if row is None:
+                self.unknown.put(token_hash, True, unknown_epoch)
+                return None
+            info            = self._info(row)
+            self.cache.put(token_hash, info, epoch)
+        return info if info.is_active(timezone.now()) else None
@@ -0,0 +1,125 @@
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Hashable, Optional, Set
+
+
+BROKER_BUFFER_SIZE = 256
+
+
+@dataclass(frozen=True)
+class BrokerEvent:
+    id      :   int     # increasing per topic; clients resume from it
+    event   :   str
+    data    :   str     # already serialized (JSON)
+
+
+class SubscriptionClosed(Exception):
+    pass
+
+
+class Subscription:
+    """One subscriber's bounded buffer on a topic.
+
+    A subscriber that falls `maxsize` events behind is dropped instead of
+    slowing down publishers or growing without bound; it should reconnect
+    and resume from the last event id it saw.
+    """
+
+    def __init__(self, broker: 'Broker', topic: Hashable, maxsize: int):
+        self.broker     = broker
+        self.topic      = topic
+        self.maxsize    = maxsize
+        self.lagged     = False
+        self.closed     = False
+        self._events    : Deque[BrokerEvent] = deque()
+        self._ready     = asyncio.Event()
+
+    def push(self, event: BrokerEvent) -> None:
+        if self.closed:
+            return
+        if len(self._events) >= self.maxsize:
+            self.lagged = True
+            self.close()
+            return
+        self._events.append(event)
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[BrokerEvent]:
+        """The next event, or None if none arrived within `timeout`."""
+        while not self._events:
+            if self.closed:
+                raise SubscriptionClosed('lagged' if self.lagged else 'closed')
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.lagged:
+            raise SubscriptionClosed('lagged')
+        return self._events.popleft()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+            self._ready.set()
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class Broker:
+    """In-process pub/sub with per-topic fan-out.
+
+    Publishing is synchronous and O(subscribers of the topic); nothing is
+    kept for topics nobody listens to. Replay after a reconnect is left to
+    the caller, which knows where the events came from (e.g. the database).
+    """
+
+    def __init__(self, buffer_size: int = BROKER_BUFFER_SIZE):
+        self.buffer_size    = buffer_size
+        self._topics        : Dict[Hashable, Set[Subscription]] = {}
+
+    def subscribe(self, topic: Hashable) -> Subscription:
+        subscription = Subscription(self, topic, self.buffer_size)
+        self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._topics[subscription.topic]
+
+    def publish(self, topic: Hashable, event: BrokerEvent) -> int:
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in list(subscribers):
+            subscription.push(event)
+        return len(subscribers)
+
+    def subscriber_count(self, topic: Optional[Hashable] = None) -> int:
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(subscribers) for subscribers in self._topics.values())
+
+
+def format_sse(event: Optional[BrokerEvent]) -> str:
+    # None is a keep-alive: a comment line that proxies won't buffer away.
+    if event is None:
+        return ': keep-alive\n\n'
+    data = ''.join(f'data: {line}\n' for line in event.data.split('\n'))
+    return f'id: {event.id}\nevent: {event.event}\n{data}\n'
+
+
+def event_message(event: BrokerEvent) -> Dict[str, Any]:
+    # WebSocket counterpart of format_sse.
+    return {'id': event.id, 'event': event.event, 'data': json.loads(event.data)}
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUTTLCache:
+    """Bounded in-process cache with LRU eviction and a per-entry TTL.
+
+    `epoch` is bumped on every invalidation. Readers grab it before going to
+    the database and hand it back to `put`, so a value read before a write
+    landed is never stored after that write invalidated the key.
+    """
+
+    def __init__(
+        self,
+        maxsize :   int                     = 1024,
+        ttl     :   float                   = 60.0,
+        timer   :   Callable[[], float]     = time.monotonic,
+    ):
+        self.maxsize    = maxsize
+        self.ttl        = ttl
+        self.timer      = timer
+        self.epoch      = 0
+        self.hits       = 0
+        self.misses     = 0
+        self.evictions  = 0
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self.timer():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, epoch: Optional[int] = None) -> None:
+        if self.maxsize <= 0 or (epoch is not None and epoch != self.epoch):
+            return
+        self._entries[key] = (self.timer() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.epoch += 1
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size'      :   len(self._entries),
+            'maxsize'   :   self.maxsize,
+            'hits'      :   self.hits,
+            'misses'    :   self.misses,
+            'evictions' :   self.evictions,
+        }
@@ -0,0 +1,261 @@
+import gzip
+import os
+import zlib
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+import anyio
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from common.conditional import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+COMPRESSION_MINIMUM_SIZE    = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', 500))
+# Bodies at least this big are compressed in a worker thread.
+COMPRESSION_OFFLOAD_SIZE    = int(os.environ.get('COMPRESSION_OFFLOAD_SIZE', 64 * 1024))
+GZIP_LEVEL                  = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+BROTLI_QUALITY              = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json',
+    'application/x-ndjson',
+    'application/xml',
+    'application/javascript',
+    'image/svg+xml',
+})
+
+
+def available_encodings() -> Tuple[str, ...]:
+    # In order of preference when the client accepts both equally.
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings: Iterable[str]) -> Optional[str]:
+    """Pick the best of `encodings` for an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def is_compressible(content_type: Optional[str], allowed: FrozenSet[str] = COMPRESSIBLE_TYPES) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith('text/') or media_type in allowed
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    # Flushes after every chunk so streamed responses (NDJSON export, ...)
+    # keep reaching the client as they are produced.
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def set_encoding(headers: MutableHeaders, encoding: str) -> None:
+    # Byte ranges and a strong ETag refer to the identity bytes, so an
+    # encoded body gets a coding-specific ETag and no Accept-Ranges.
+    headers['content-encoding'] = encoding
+    etag = headers.get('etag')
+    if etag is not None:
+        headers['etag'] = encoded_etag(etag, encoding)
+    if 'accept-ranges' in headers:
+        del headers['accept-ranges']
+    add_vary(headers)
+
+
+def set_not_modified_etag(headers: MutableHeaders, encoding: str, if_none_match: Optional[str]) -> None:
+    # A 304 must carry the ETag of the variant the client cached. Whether the
+    # 200 would have been compressed can't be told from a bodiless 304, so
+    # the encoded tag is sent unless the client holds the identity one.
+    etag = headers.get('etag')
+    if etag is None:
+        return
+    encoded = encoded_etag(etag, encoding)
+    if if_none_match is None or encoded in if_none_match or etag not in if_none_match:
+        headers['etag'] = encoded
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get('vary')
+    if vary is None:
+        headers['vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        headers['vary'] = vary + ', Accept-Encoding'
+
+
+class CompressionMiddleware:
+    """Negotiated gzip (and brotli, when installed) response compression.
+
+    Only bodies of an allowed content type and at least `minimum_size`
+    bytes are compressed; responses that already carry a Content-Encoding
+    (e.g. PrecompressedBody) or are partial (206) pass through. Every
+    response of an allowed type, and every 304, says Vary: Accept-Encoding,
+    compressed or not. A strong
+    ETag gets the coding appended ("abc-gzip"); common.conditional maps it
+    back, so If-None-Match and If-Match keep working for clients that send
+    it back verbatim, while If-Range never matches it and a resumed
+    download restarts from the identity bytes.
+    """
+
+    def __init__(
+        self,
+        app             :   ASGIApp,
+        minimum_size    :   int                         = COMPRESSION_MINIMUM_SIZE,
+        offload_size    :   int                         = COMPRESSION_OFFLOAD_SIZE,
+        media_types     :   FrozenSet[str]              = COMPRESSIBLE_TYPES,
+        encodings       :   Optional[Tuple[str, ...]]   = None,
+    ):
+        self.app            = app
+        self.minimum_size   = minimum_size
+        self.offload_size   = offload_size
+        self.media_types    = media_types
+        self.encodings      = encodings or available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding        = negotiate_encoding(request_headers.get('accept-encoding'), self.encodings)
+
+        start       : Optional[Message]         = None
+        compressor  : Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message['type'] == 'http.response.start':
+                headers         = MutableHeaders(raw=list(message['headers']))
+                status_code     = message['status']
+                compressible    = is_compressible(headers.get('content-type'), self.media_types)
+                # Caches must key on Accept-Encoding whether or not this
+                # particular response was compressed.
+                if compressible or status_code == 304:
+                    add_vary(headers)
+                if status_code == 304 and encoding is not None:
+                    set_not_modified_etag(headers, encoding, request_headers.get('if-none-match'))
+                message['headers'] = headers.raw
+                length      = headers.get('content-length')
+                passthrough = (
+                    encoding is None
+                    or status_code in (204, 206, 304)
+                    or 'content-encoding' in headers
+                    or not compressible
+                    or (length is not None and length.isdigit() and int(length) < self.minimum_size)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether
+                    # the whole body arrives at once.
+                    start = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                # e.g. http.response.zerocopysend: sent as is, uncompressed.
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body        = message.get('body', b'')
+            more_body   = message.get('more_body', False)
+            if start is not None:
+                response_start, start = start, None
+                headers = MutableHeaders(raw=response_start['headers'])
+                if not more_body:
+                    if len(body) < self.minimum_size:
+                        await send(response_start)
+                        await send(message)
+                        return
+                    if len(body) >= self.offload_size:
+                        body = await anyio.to_thread.run_sync(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    set_encoding(headers, encoding)
+                    headers['content-length'] = str(len(body))
+                    await send(response_start)
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                compressor = StreamCompressor(encoding)
+                set_encoding(headers, encoding)
+                del headers['content-length']
+                await send(response_start)
+
+            data = compressor.chunk(body) if body else b''
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedBody:
+    """A constant body compressed once, served in whichever encoding fits.
+
+    Build these at import/startup time for fixed pages; `response()` then
+    only negotiates and returns the cached bytes.
+    """
+
+    def __init__(self, body: bytes, media_type: str, encodings: Optional[Tuple[str, ...]] = None):
+        self.media_type = media_type
+        self.encoded    : Dict[str, bytes] = {}
+        for encoding in encodings or available_encodings():
+            compressed = compress(body, encoding)
+            if len(compressed) < len(body):
+                self.encoded[encoding] = compressed
+        self.identity   = body
+
+    def response(self, headers: Mapping[str, str], status_code: int = 200) -> Response:
+        encoding = negotiate_encoding(headers.get('accept-encoding'), self.encoded)
+        response = Response(
+            self.encoded[encoding] if encoding else self.identity,
+            status_code = status_code,
+            media_type  = self.media_type,
+        )
+        if encoding:
+            response.headers['content-encoding'] = encoding
+        response.headers['vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+
+
+def make_etag(body: bytes) -> str:
+    # Strong validator: a digest of the exact representation sent.
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+# Content-codings CompressionMiddleware may tag onto a strong ETag.
+ETAG_CODINGS = ('gzip', 'br')
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # A strong validator must differ between content-codings (RFC 9110
+    # 8.8.3), so "abc" becomes "abc-gzip"; weak ones may be shared.
+    if etag.startswith('W/') or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + '-' + encoding + '"'
+
+
+def identity_etag(etag: str) -> str:
+    # The ETag the app computed, for one a client echoes back from an
+    # encoded response: it names the same underlying representation.
+    for encoding in ETAG_CODINGS:
+        suffix = '-' + encoding + '"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def to_utc(value: datetime) -> datetime:
+    # The apps store naive local timestamps (datetime.now).
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(to_utc(value), usegmt=True)
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    if header is None:
+        return False
+    for candidate in (part.strip() for part in header.split(',')):
+        if candidate == '*':
+            return True
+        if weak:
+            candidate = candidate[2:] if candidate.startswith('W/') else candidate
+        if identity_etag(candidate) == etag:
+            return True
+    return False
+
+
+def is_not_modified(
+    headers: Mapping[str, str], etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag, weak=True)
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return to_utc(last_modified) <= since
+
+
+def conditional_response(
+    headers         :   Mapping[str, str],
+    body            :   bytes,
+    media_type      :   str                 = 'application/json',
+    last_modified   :   Optional[datetime]  = None,
+    etag            :   Optional[str]       = None,
+) -> Response:
+    etag                = etag or make_etag(body)
+    response_headers    = {'ETag': etag}
+    if last_modified is not None:
+        response_headers['Last-Modified'] = http_date(last_modified)
+    if is_not_modified(headers, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+    return Response(content=body, media_type=media_type, headers=response_headers)
+
+
+def if_match_holds(if_match: Optional[str], etag: Optional[str]) -> bool:
+    # Optimistic concurrency: If-Match uses the strong comparison, and a
+    # missing resource never matches (except for '*', which needs one to exist).
+    if if_match is None:
+        return True
+    return etag is not None and etag_matches(if_match, etag, weak=False)
+
+
+def check_if_match(if_match: Optional[str], etag: Optional[str]) -> None:
+    if not if_match_holds(if_match, etag):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED)
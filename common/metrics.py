@@ -0,0 +1,257 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from common.routing import match_route_path
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS   = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = '<unmatched>'
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name           = name
+        self.documentation  = documentation
+        self.labelnames     = tuple(labelnames)
+        self._values        : Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self._values.items():
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    def __init__(
+        self,
+        name            :   str,
+        documentation   :   str,
+        labelnames      :   Sequence[str]   = (),
+        buckets         :   Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name           = name
+        self.documentation  = documentation
+        self.labelnames     = tuple(labelnames)
+        self.buckets        = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative) + overflow, sum]
+        self._values        : Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                yield f'{self.name}_bucket{le} {cumulative}'
+            cumulative += counts[-1]
+            inf = _labels(self.labelnames, labels, 'le="+Inf"')
+            yield f'{self.name}_bucket{inf} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    """Metrics of one process, rendered in the Prometheus text format.
+
+    Collectors are callables returning extra, already formatted lines (e.g.
+    cache counters owned by an app).
+    """
+
+    def __init__(self):
+        self.metrics    : List[Any]                             = []
+        self.collectors : List[Callable[[], Iterable[str]]]     = []
+
+    def register(self, metric: Any) -> Any:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status'),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ('method', 'route'),
+))
+http_request_db_queries = registry.register(Histogram(
+    'http_request_db_queries', 'Database queries per HTTP request.', ('method', 'route'),
+    buckets=QUERY_BUCKETS,
+))
+http_request_db_duration_seconds = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Database time per HTTP request.', ('method', 'route'),
+))
+db_queries_total = registry.register(Counter(
+    'db_queries_total', 'Database queries by operation.', ('operation',),
+))
+
+
+def cache_collector(caches: Dict[str, Any]) -> Callable[[], Iterable[str]]:
+    """Exposes `stats()` of named LRUTTLCache instances as gauges/counters."""
+    def collect() -> Iterable[str]:
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        for field, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'), ('size', 'gauge')):
+            metric = f'cache_{field}' + ('_total' if kind == 'counter' else '')
+            yield f'# HELP {metric} Cache {field}.'
+            yield f'# TYPE {metric} {kind}'
+            for name, values in stats.items():
+                yield f'{metric}{_labels(("cache",), (name,))} {values[field]}'
+    return collect
+
+
+class _QueryStats:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count      = 0
+        self.seconds    = 0.0
+
+
+_query_stats: ContextVar[Optional[_QueryStats]] = ContextVar('query_stats', default=None)
+
+
+def _record_query(operation: str, seconds: float) -> None:
+    db_queries_total.inc((operation,))
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count     += 1
+        stats.seconds   += seconds
+
+
+class InstrumentedDatabase:
+    """Wraps a `databases.Database` and counts queries and time spent in them.
+
+    Counts go to the `db_queries_total` counter and, inside a request, to
+    that request's totals for MetricsMiddleware. Everything else (connect,
+    transaction, ...) is delegated untouched.
+    """
+
+    def __init__(self, database: Any):
+        self.database = database
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.database, name)
+
+    async def _timed(self, operation: str, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _record_query(operation, time.perf_counter() - started)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed('execute', self.database.execute, *args, **kwargs)
+
+    async def execute_many(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed('execute_many', self.database.execute_many, *args, **kwargs)
+
+    async def fetch_all(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed('fetch_all', self.database.fetch_all, *args, **kwargs)
+
+    async def fetch_one(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed('fetch_one', self.database.fetch_one, *args, **kwargs)
+
+    async def fetch_val(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed('fetch_val', self.database.fetch_val, *args, **kwargs)
+
+    async def iterate(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        try:
+            async for row in self.database.iterate(*args, **kwargs):
+                yield row
+        finally:
+            _record_query('iterate', time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """Per-route request counts, status codes, latency and DB usage.
+
+    Routes are labelled with their path template so ids don't blow up the
+    label cardinality; unmatched paths share one label. Latency covers the
+    whole response, including streamed bodies.
+    """
+
+    def __init__(self, app: ASGIApp, skip_paths: Sequence[str] = ('/metrics',)):
+        self.app        = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['path'] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        route       = match_route_path(scope) or UNMATCHED_ROUTE
+        method      = scope['method']
+        status      = 500
+        stats       = _QueryStats()
+        token       = _query_stats.set(stats)
+        started     = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _query_stats.reset(token)
+            labels  = (method, route)
+            http_requests_total.inc((method, route, str(status)))
+            http_request_duration_seconds.observe(elapsed, labels)
+            http_request_db_queries.observe(stats.count, labels)
+            http_request_db_duration_seconds.observe(stats.seconds, labels)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(registry.render(), media_type='text/plain; version=0.0.4')
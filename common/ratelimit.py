@@ -0,0 +1,223 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import anyio
+from starlette.types import ASGIApp, Receive, Scope, Send
+from common.routing import match_route_path
+
+
+RATE_LIMIT_ENABLED      = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMIT_BACKEND      = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_SQLITE_PATH  = os.environ.get('RATE_LIMIT_SQLITE_PATH', 'ratelimit.db')
+# Catch-all limit as "rate/burst" (e.g. "50/100"); empty means none. Apps
+# pass parse_rate_limit(RATE_LIMIT_DEFAULT) as `default` to opt in.
+RATE_LIMIT_DEFAULT      = os.environ.get('RATE_LIMIT_DEFAULT', '')
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate    :   float   # tokens added per second
+    burst   :   int     # bucket capacity
+
+    def __post_init__(self):
+        # A bucket that never refills would lock a client out for good; a
+        # burst-only limit is a small rate with the burst as its capacity.
+        if self.rate <= 0:
+            raise ValueError(f'RateLimit rate must be positive, got {self.rate}')
+        if self.burst < 1:
+            raise ValueError(f'RateLimit burst must be at least 1, got {self.burst}')
+
+
+def parse_rate_limit(value: str) -> Optional[RateLimit]:
+    """Parse "rate/burst" (burst defaults to the rate, rounded up); '' is None."""
+    if not value.strip():
+        return None
+    rate, _, burst = value.partition('/')
+    return RateLimit(rate=float(rate), burst=int(burst) if burst.strip() else max(1, math.ceil(float(rate))))
+
+
+def take_token(
+    tokens: float, updated: float, now: float, limit: RateLimit
+) -> Tuple[float, float]:
+    """Refill a bucket up to `now` and take one token from it.
+
+    Returns the new token count and how long to wait before retrying (0 when
+    the request is allowed).
+    """
+    tokens = min(limit.burst, tokens + max(0.0, now - updated) * limit.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+
+class MemoryRateLimitBackend:
+    """Per-process buckets in an LRU-bounded OrderedDict: O(1) per request."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now             = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(limit.burst), now))
+        tokens, retry   = take_token(tokens, updated, now, limit)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry
+
+
+class SQLiteRateLimitBackend:
+    """Buckets in a SQLite file so every worker on the host shares them.
+
+    Each acquire is one BEGIN IMMEDIATE transaction, run on a worker thread;
+    wall-clock time is used because monotonic clocks aren't shared between
+    processes. The connection is opened on first use in each process: the
+    middleware is built when the app is imported, possibly in a parent that
+    forks workers afterwards, and a SQLite connection must not cross fork().
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path           = path
+        self._lock          = threading.Lock()
+        self._connection    : Optional[sqlite3.Connection] = None
+        self._pid           : Optional[int] = None
+        # Connections inherited across fork(), kept referenced so they are
+        # never used or closed (closing may checkpoint the parent's WAL).
+        self._inherited     : List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        if self._connection is not None:
+            self._inherited.append(self._connection)
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA busy_timeout = 5000')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._connection, self._pid = connection, os.getpid()
+        return connection
+
+    def _acquire(self, key: str, limit: RateLimit) -> float:
+        with self._lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = connection.execute(
+                    'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+                ).fetchone()
+                tokens, updated = row if row is not None else (float(limit.burst), now)
+                tokens, retry   = take_token(tokens, updated, now, limit)
+                connection.execute(
+                    'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                    (key, tokens, now),
+                )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return retry
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        return await anyio.to_thread.run_sync(self._acquire, key, limit)
+
+
+def create_rate_limit_backend():
+    if RATE_LIMIT_BACKEND == 'sqlite':
+        return SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH)
+    return MemoryRateLimitBackend()
+
+
+class RateLimitMiddleware:
+    """Token-bucket rate limiting keyed on a verified `Token` header or client IP.
+
+    The limit for a request is the first of: `keys[client key]`,
+    `routes[route path]`, `default`. Routes with their own rule get their
+    own bucket per client; everything else shares one bucket per client.
+    Client keys are `token:<value>` or `ip:<address>`; tokens are hashed
+    before they are used as bucket names. The header is unauthenticated, so
+    a token only gets its own bucket when it is listed in `keys` or
+    `verified(token)` says the app knows it; anything else is keyed on the
+    client address, or a random token per request would get a fresh bucket
+    every time.
+    """
+
+    def __init__(
+        self,
+        app         :   ASGIApp,
+        default     :   Optional[RateLimit]             = None,
+        routes      :   Optional[Dict[str, RateLimit]]  = None,
+        keys        :   Optional[Dict[str, RateLimit]]  = None,
+        header      :   str                             = 'token',
+        backend     =   None,
+        enabled     :   bool                            = RATE_LIMIT_ENABLED,
+        verified    :   Optional[Callable[[str], bool]] = None,
+    ):
+        self.app        = app
+        self.enabled    = enabled
+        self.default    = default
+        self.routes     = routes or {}
+        self.keys       = keys or {}
+        self.header     = header.lower().encode()
+        self.backend    = backend or create_rate_limit_backend()
+        self.verified   = verified
+
+    def _client_key(self, scope: Scope) -> str:
+        for name, value in scope['headers']:
+            if name == self.header:
+                token   = value.decode('latin-1')
+                key     = 'token:' + token
+                if key in self.keys or (self.verified is not None and self.verified(token)):
+                    return key
+                break
+        client = scope.get('client')
+        return 'ip:' + (client[0] if client else 'unknown')
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        client_key  = self._client_key(scope)
+        route_path  = match_route_path(scope) if self.routes else None
+        limit       = (
+            self.keys.get(client_key)
+            or (self.routes.get(route_path) if route_path is not None else None)
+            or self.default
+        )
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        bucket  = route_path if route_path in self.routes else '*'
+        key     = bucket + '|' + hashlib.sha256(client_key.encode()).hexdigest()[:32]
+        retry   = await self.backend.acquire(key, limit)
+        if retry <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({'detail': 'Too Many Requests'}).encode()
+        await send({
+            'type'      :   'http.response.start',
+            'status'    :   429,
+            'headers'   :   [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(math.ceil(retry)).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
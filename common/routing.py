@@ -0,0 +1,18 @@
+from typing import Optional
+
+from starlette.routing import Match
+from starlette.types import Scope
+
+
+def match_route_path(scope: Scope) -> Optional[str]:
+    """The path template (e.g. `/posts/{id}`) of the app route `scope` hits.
+
+    Works from middleware, before the router has run, through the app that
+    Starlette stores in `scope['app']`.
+    """
+    router = getattr(scope.get('app'), 'router', None)
+    for route in getattr(router, 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', None)
+    return None
@@ -0,0 +1,151 @@
+import mimetypes
+import os
+from datetime import datetime
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+from common.conditional import http_date, is_not_modified, make_etag
+
+
+ASSET_CACHE_CONTROL = os.environ.get('ASSET_CACHE_CONTROL', 'public, max-age=3600')
+FILE_CHUNK_SIZE     = 64 * 1024
+
+
+def resolve_asset(root: str, relative: str) -> Optional[str]:
+    """`root`/`relative` if it is a regular file inside `root`, else None."""
+    root        = os.path.realpath(root)
+    candidate   = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath((root, candidate)) != root or not os.path.isfile(candidate):
+        return None
+    return candidate
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """First byte and length of a single `bytes=` range.
+
+    Returns None when the header should be ignored (malformed, another unit
+    or several ranges, which are served as a plain 200) and raises
+    ValueError when the range can't be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = (part.strip() for part in spec.partition('-'))
+    if not dash or not (first or last) or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = min(int(last), size)
+        if length == 0:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end   = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def if_range_matches(if_range: str, etag: str, last_modified: str) -> bool:
+    # If-Range needs an exact, strong validator; weak ETags never match.
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return if_range == last_modified
+
+
+class FileRangeResponse(Response):
+    """A file with validators, Cache-Control, 304s and single byte ranges.
+
+    The file is stat-ed once when the response is built; the ETag is
+    derived from its mtime and size so the body never has to be hashed.
+    Bodies go out through the server's zero-copy extension
+    (`http.response.zerocopysend`) when it offers one, otherwise in chunks
+    read off the event loop.
+    """
+
+    def __init__(
+        self,
+        path            :   str,
+        request_headers :   Mapping[str, str],
+        method          :   str             = 'GET',
+        cache_control   :   str             = ASSET_CACHE_CONTROL,
+        media_type      :   Optional[str]   = None,
+    ):
+        stat_result         = os.stat(path)
+        size                = stat_result.st_size
+        modified            = datetime.fromtimestamp(stat_result.st_mtime)
+        self.path           = path
+        self.send_body      = method != 'HEAD'
+        self.offset         = 0
+        self.length         = size
+        self.status_code    = 200
+        self.media_type     = media_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.background     = None
+
+        etag                = make_etag(f'{stat_result.st_mtime_ns}-{size}'.encode())
+        last_modified       = http_date(modified)
+        headers             = {
+            'etag'          :   etag,
+            'last-modified' :   last_modified,
+            'cache-control' :   cache_control,
+            'accept-ranges' :   'bytes',
+        }
+
+        range_header        = request_headers.get('range')
+        if_range            = request_headers.get('if-range')
+        if is_not_modified(request_headers, etag, modified):
+            self.status_code    = 304
+            self.length         = 0
+        elif range_header is not None and method in ('GET', 'HEAD') \
+                and (if_range is None or if_range_matches(if_range, etag, last_modified)):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                self.status_code            = 416
+                self.length                 = 0
+                headers['content-range']    = f'bytes */{size}'
+            else:
+                if byte_range is not None:
+                    self.offset, self.length    = byte_range
+                    self.status_code            = 206
+                    last_byte                   = self.offset + self.length - 1
+                    headers['content-range']    = f'bytes {self.offset}-{last_byte}/{size}'
+
+        if self.status_code == 304:
+            self.media_type = None
+        else:
+            headers['content-length'] = str(self.length)
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        extensions = scope.get('extensions') or {}
+        if 'http.response.zerocopysend' in extensions:
+            with open(self.path, 'rb') as file:
+                await send({
+                    'type'      :   'http.response.zerocopysend',
+                    'file'      :   file,
+                    'offset'    :   self.offset,
+                    'count'     :   self.length,
+                })
+            return
+
+        async with await anyio.open_file(self.path, 'rb') as file:
+            await file.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk       = await file.read(min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining  -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0:
+                # The file shrank under us; end the response anyway.
+                await send({'type': 'http.response.body', 'body': b''})
@@ -1,10 +1,40 @@
 from fastapi import FastAPI, Path, Query, Body, Form, File, UploadFile, Header, Cookie, Request, status, Response, HTTPException
-from typing import List, Optional
+from typing import Any, Callable, List, Optional, TypeVar
 from pydantic import BaseModel
 from enum import Enum
-from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, FileResponse 
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse, RedirectResponse
+import asyncio
+import logging
+import os
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from common.metrics import MetricsMiddleware, metrics_endpoint
+from common.compression import CompressionMiddleware, PrecompressedBody
+from common.static import FileRangeResponse, resolve_asset
+from common.conditional import conditional_response, if_match_holds, make_etag
+from post_store import POST_STORE_SNAPSHOT_INTERVAL, MemoryPostStore, StoredPost, create_post_store, now
+from uploads import ContentAddressedStore, UploadLimitMiddleware, UploadTooLarge, UPLOAD_MAX_SIZE
+
+UPLOAD_MAX_FILES = 20
+ASSETS_DIRECTORY = os.environ.get('ASSETS_DIRECTORY', os.path.join(os.path.dirname(__file__), 'assets'))
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+# Per request: every file may use its full UPLOAD_MAX_SIZE, plus room for the
+# multipart framing. The store still caps each file on its own.
+app.add_middleware(UploadLimitMiddleware, limits={
+    '/files'            :   UPLOAD_MAX_SIZE + 64 * 1024,
+    '/files/multiple'   :   UPLOAD_MAX_SIZE * UPLOAD_MAX_FILES + 64 * 1024,
+})
+# Added last so it wraps the upload limit and also counts rejected uploads.
+app.add_middleware(MetricsMiddleware)
+app.add_route('/metrics', metrics_endpoint, include_in_schema=False)
+
+upload_store = ContentAddressedStore()
+
 
 class UserType(str, Enum):
     STANDARD = "standard"
@@ -70,42 +100,126 @@ async def create_user_form(name: str = Form(...), age: int = Form(...)):
 # async def upload_file(file: bytes = File(...)):
 #     return {"file_size": len(file)}
 
+async def store_upload(file: UploadFile) -> dict:
+    try:
+        stored = await upload_store.save(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    return {
+        'file_name'     : file.filename,
+        'content_type'  : file.content_type,
+        'sha256'        : stored.sha256,
+        'size'          : stored.size,
+        'duplicate'     : stored.duplicate,
+    }
+
 @app.post('/files')
 async def upload_file(file: UploadFile = File(...)):
-    return {"file_name": file.filename, 'content-type': file.content_type}
+    return await store_upload(file)
 
 @app.post('/files/multiple')
 async def upload_multiple_files(files: List[UploadFile] = File(...)):
-    return [
-        {'file_name': file.filename, 'content_type': file.content_type}
-        for file in files
-    ]
+    if len(files) > UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, detail=f'At most {UPLOAD_MAX_FILES} files per request'
+        )
+    return await asyncio.gather(*(store_upload(file) for file in files))
 
 
 @app.post('/posts', status_code=status.HTTP_201_CREATED)
 async def create_post(post: Post):
     return post
 
-# Dummy database
-posts = {
-    1: Post(title='Hello', nb_views=100),
-}
+# Posts live in a pluggable store (in-memory columns by default, optionally
+# snapshotted to disk, or SQLite to share them between workers; the
+# in-memory one is single-process only).
+post_store = create_post_store()
+snapshot_task: Optional['asyncio.Task[None]'] = None
+
+T = TypeVar('T')
+
+async def in_store(function: Callable[..., T], *args: Any) -> T:
+    # Blocking stores run in the threadpool; the in-memory one is cheaper to
+    # call inline than to hand off.
+    if post_store.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
+
+@app.on_event('startup')
+async def seed_post_store():
+    if await in_store(len, post_store) == 0:
+        await in_store(post_store.put, 1, StoredPost(title='Hello', nb_views=100, updated_at=now()))
+
+async def snapshot_post_store(store: MemoryPostStore) -> None:
+    # The columns are copied on the event loop, where the writes happen;
+    # pickling and writing the copy go to the threadpool.
+    while True:
+        await asyncio.sleep(POST_STORE_SNAPSHOT_INTERVAL)
+        captured = store.capture()
+        if captured is None:
+            continue
+        try:
+            await run_in_threadpool(store.write_snapshot, captured)
+        except OSError:
+            # Retried on the next tick: the version on disk didn't advance.
+            logger.exception('Could not write the post store snapshot')
+
+@app.on_event('startup')
+async def start_post_store_snapshots():
+    global snapshot_task
+    if isinstance(post_store, MemoryPostStore) and post_store.snapshot_path is not None:
+        snapshot_task = asyncio.create_task(snapshot_post_store(post_store))
+
+@app.on_event('shutdown')
+async def close_post_store():
+    # A snapshot being written is finished before close() takes the last one.
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        await asyncio.gather(snapshot_task, return_exceptions=True)
+    await in_store(post_store.close)
+
+# The ETag covers the whole stored post, not just the public fields, so
+# If-Match catches any concurrent change.
+def post_etag(post: Post) -> str:
+    return make_etag(post.json().encode())
 
 @app.delete('/posts/{id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(id: int):
-    posts.pop(id, None)
+    await in_store(post_store.delete, id)
     return None
 
 @app.put('/posts/{id}')
-async def update_or_create_post(id: int, post: Post, response: Response):
-    if id not in posts:
+async def update_or_create_post(
+    id: int, post: Post, response: Response, if_match: Optional[str] = Header(None)
+):
+    # The If-Match check runs inside the store's write, so two PUTs made
+    # with the same ETag can't both pass it.
+    def etag_still_matches(current: Optional[StoredPost]) -> bool:
+        return if_match_holds(if_match, current and post_etag(Post(title=current.title, nb_views=current.nb_views)))
+
+    created = await in_store(
+        post_store.put_if, id, StoredPost(title=post.title, nb_views=post.nb_views, updated_at=now()), etag_still_matches
+    )
+    if created is None:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED)
+    if created:
         response.status_code = status.HTTP_201_CREATED
-    posts[id] = post
-    return posts[id]
+    response.headers['ETag'] = post_etag(post)
+    return post
 
 @app.get('/posts/{id}', response_model=PublicPost)
-async def get_post(id: int):
-    return posts[id]
+async def get_post(id: int, request: Request):
+    stored = await in_store(post_store.get, id)
+    if stored is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    post = Post(title=stored.title, nb_views=stored.nb_views)
+    body = JSONResponse(jsonable_encoder(PublicPost(**post.dict()))).body
+    return conditional_response(
+        request.headers,
+        body,
+        last_modified   =   datetime.fromtimestamp(stored.updated_at),
+        etag            =   post_etag(post),
+    )
 
 @app.get('/response')
 async def get_response(response: Response):
@@ -128,9 +242,8 @@ async def check_password(password: str = Body(...), password_confirm: str = Body
         )
     return {"message": "Password match."}
 
-@app.get('/html', response_class=HTMLResponse)
-async def get_html():
-    return '''
+# Constant pages are compressed once, at import, and served from memory.
+HTML_PAGE = PrecompressedBody('''
         <html>
             <head>
                 <title>Hello world!</title>
@@ -139,7 +252,11 @@ async def get_html():
                 <h1>Hello world!</h1>
             </body>
         </html>
-    '''
+    '''.encode(), media_type='text/html')
+
+@app.get('/html', response_class=HTMLResponse)
+async def get_html(request: Request):
+    return HTML_PAGE.response(request.headers)
 
 @app.get('/text', response_class=PlainTextResponse)
 async def text():
@@ -149,15 +266,24 @@ async def text():
 async def redirect():
     return RedirectResponse('/new-url', status_code=status.HTTP_301_MOVED_PERMANENTLY)
 
+def serve_asset(asset_path: str, request: Request) -> FileRangeResponse:
+    file_path = resolve_asset(ASSETS_DIRECTORY, asset_path)
+    if file_path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return FileRangeResponse(file_path, request.headers, method=request.method)
+
 @app.get('/cat')
-async def get_cat():
-    root_directory = path.dirname(path.dirname(__file__))
-    picture_path = path.join(root_directory, 'assets', 'example.jpg')
-    return FileResponse(picture_path)
+async def get_cat(request: Request):
+    return serve_asset('example.jpg', request)
 
-@app.get('/xml')
-async def get_xml():
-    content = '''<?xml version='1.0' encoding='UTF-8'?>
+@app.api_route('/assets/{asset_path:path}', methods=['GET', 'HEAD'])
+async def get_asset(asset_path: str, request: Request):
+    return serve_asset(asset_path, request)
+
+XML_DOCUMENT = PrecompressedBody('''<?xml version='1.0' encoding='UTF-8'?>
         <Hello>World</Hello>
-    '''
-    return Response(content=content, media_type='application/xml')
\ No newline at end of file
+    '''.encode(), media_type='application/xml')
+
+@app.get('/xml')
+async def get_xml(request: Request):
+    return XML_DOCUMENT.response(request.headers)
\ No newline at end of file
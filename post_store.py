@@ -0,0 +1,310 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+POST_STORE_BACKEND          = os.environ.get('POST_STORE_BACKEND', 'memory')
+POST_STORE_SNAPSHOT         = os.environ.get('POST_STORE_SNAPSHOT')
+# Seconds between snapshots of the in-memory store (only when it has changed).
+POST_STORE_SNAPSHOT_INTERVAL = float(os.environ.get('POST_STORE_SNAPSHOT_INTERVAL', 5))
+POST_STORE_SQLITE_PATH      = os.environ.get('POST_STORE_SQLITE_PATH', 'posts.db')
+
+
+# ids, titles, nb_views, updated_at: one entry per post, in the same order.
+SnapshotColumns = Tuple[array, List[Optional[str]], array, array]
+
+
+class StoredPost(NamedTuple):
+    title       :   str
+    nb_views    :   int
+    updated_at  :   float
+
+
+class PostStore(ABC):
+    """Storage interface for the main.py posts."""
+
+    # Stores whose calls do I/O set this; main.py runs them in the threadpool.
+    blocking = False
+
+    @abstractmethod
+    def get(self, id: int) -> Optional[StoredPost]:
+        ...
+
+    @abstractmethod
+    def put(self, id: int, post: StoredPost) -> bool:
+        """Insert or replace a post; returns True if it was created."""
+
+    @abstractmethod
+    def put_if(
+        self, id: int, post: StoredPost, condition: Callable[[Optional[StoredPost]], bool]
+    ) -> Optional[bool]:
+        """put() if `condition(current post)` holds, as one atomic step.
+
+        Returns None, without writing, when it doesn't. This is the
+        compare-and-set behind If-Match: a check and a put made as separate
+        calls let a concurrent write land in between.
+        """
+
+    @abstractmethod
+    def delete(self, id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def scan(self) -> Iterator[Tuple[int, StoredPost]]:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryPostStore(PostStore):
+    """Column-oriented in-memory store.
+
+    Each field lives in its own list/array and an id maps to a row number,
+    so an entry costs a dict slot, one title string and 16 bytes of packed
+    numbers instead of a whole pydantic model. Deleted rows are reused.
+
+    With `snapshot_path`, the columns are loaded back on construction and
+    pickled to disk by `snapshot()`: main.py takes one every
+    POST_STORE_SNAPSHOT_INTERVAL seconds when there were writes, and on
+    shutdown, so a crash loses at most that interval. The store is
+    single-process only: each worker has its own copy and the last one to
+    write the snapshot wins, so run several workers on SQLitePostStore.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path                      = snapshot_path
+        self._rows      : Dict[int, int]        = {}
+        self._titles    : List[Optional[str]]   = []
+        self._views                             = array('q')
+        self._updated                           = array('d')
+        self._free      : List[int]             = []
+        # Bumped by every write; the snapshot on disk is of `_saved_version`.
+        self._version                           = 0
+        self._saved_version                     = 0
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def get(self, id: int) -> Optional[StoredPost]:
+        row = self._rows.get(id)
+        if row is None:
+            return None
+        return StoredPost(self._titles[row], self._views[row], self._updated[row])
+
+    def put(self, id: int, post: StoredPost) -> bool:
+        row = self._rows.get(id)
+        created = row is None
+        if created:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._titles)
+                self._titles.append(None)
+                self._views.append(0)
+                self._updated.append(0.0)
+            self._rows[id] = row
+        self._titles[row]   = post.title
+        self._views[row]    = post.nb_views
+        self._updated[row]  = post.updated_at
+        self._version      += 1
+        return created
+
+    def put_if(
+        self, id: int, post: StoredPost, condition: Callable[[Optional[StoredPost]], bool]
+    ) -> Optional[bool]:
+        # Called inline on the event loop (blocking is False), so nothing
+        # else runs between the check and the write.
+        if not condition(self.get(id)):
+            return None
+        return self.put(id, post)
+
+    def delete(self, id: int) -> bool:
+        row = self._rows.pop(id, None)
+        if row is None:
+            return False
+        self._titles[row] = None
+        self._free.append(row)
+        self._version += 1
+        return True
+
+    def scan(self) -> Iterator[Tuple[int, StoredPost]]:
+        for id, row in list(self._rows.items()):
+            yield id, StoredPost(self._titles[row], self._views[row], self._updated[row])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def capture(self, force: bool = False) -> Optional[Tuple[int, SnapshotColumns]]:
+        """Copy the columns, compacted (no free rows); None if nothing changed.
+
+        Cheap next to pickling them, so it runs where the writes happen and
+        write_snapshot() can run in a thread on the copy.
+        """
+        if self._version == self._saved_version and not force:
+            return None
+        rows    = list(self._rows.values())
+        columns = (
+            array('q', self._rows.keys()),
+            [self._titles[row] for row in rows],
+            array('q', (self._views[row] for row in rows)),
+            array('d', (self._updated[row] for row in rows)),
+        )
+        return self._version, columns
+
+    def write_snapshot(self, captured: Tuple[int, SnapshotColumns], path: Optional[str] = None) -> None:
+        # Written to a temporary file and renamed, so a crash mid-write never
+        # leaves a truncated snapshot behind. The temporary name is unique,
+        # so two snapshots written at once don't write into each other's file.
+        path = path or self.snapshot_path
+        if path is None:
+            return
+        version, columns = captured
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + '.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as snapshot_file:
+                pickle.dump(columns, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self._saved_version = max(self._saved_version, version)
+
+    def snapshot(self, path: Optional[str] = None) -> None:
+        # A snapshot to another path is always written.
+        captured = self.capture(force=path is not None)
+        if captured is not None:
+            self.write_snapshot(captured, path)
+
+    def load(self, path: str) -> None:
+        with open(path, 'rb') as snapshot_file:
+            ids, titles, views, updated = pickle.load(snapshot_file)
+        self._rows      = dict(zip(ids, range(len(ids))))
+        self._titles    = titles
+        self._views     = views
+        self._updated   = updated
+        self._free      = []
+
+    def close(self) -> None:
+        self.snapshot()
+
+
+class SQLitePostStore(PostStore):
+    """SQLite-backed store for sharing posts across worker processes.
+
+    WAL mode lets every worker read while one writes; each operation is a
+    single autocommitted statement. Calls block, so they are made from
+    threadpool threads, each with its own connection, opened on first use
+    in that thread and process: a SQLite connection must not cross fork(),
+    e.g. from a serve.py parent that imported the app into its workers.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = POST_STORE_SQLITE_PATH):
+        self.path           = path
+        self._local         = threading.local()
+        self._lock          = threading.Lock()
+        self._connections   : List[sqlite3.Connection] = []
+        self._pid           = os.getpid()
+        # Connections inherited across fork(), kept referenced so they are
+        # never used or closed (closing may checkpoint the parent's WAL).
+        self._inherited     : List[sqlite3.Connection] = []
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._inherited.extend(self._connections)
+                    self._connections   = []
+                    self._local         = threading.local()
+                    self._pid           = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread is off only so close() can close them all.
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA busy_timeout = 5000')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS posts ('
+            'id INTEGER PRIMARY KEY, title TEXT NOT NULL, '
+            'nb_views INTEGER NOT NULL, updated_at REAL NOT NULL)'
+        )
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def get(self, id: int) -> Optional[StoredPost]:
+        row = self._connection.execute(
+            'SELECT title, nb_views, updated_at FROM posts WHERE id = ?', (id,)
+        ).fetchone()
+        return None if row is None else StoredPost(*row)
+
+    def put(self, id: int, post: StoredPost) -> bool:
+        return self.put_if(id, post, lambda current: True)
+
+    def put_if(
+        self, id: int, post: StoredPost, condition: Callable[[Optional[StoredPost]], bool]
+    ) -> Optional[bool]:
+        # The read, the check and the upsert share one write transaction, so
+        # other workers' writes wait for it instead of slipping in between.
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT title, nb_views, updated_at FROM posts WHERE id = ?', (id,)
+            ).fetchone()
+            if not condition(None if row is None else StoredPost(*row)):
+                return None
+            connection.execute(
+                'INSERT OR REPLACE INTO posts (id, title, nb_views, updated_at) VALUES (?, ?, ?, ?)',
+                (id, *post),
+            )
+        return row is None
+
+    def delete(self, id: int) -> bool:
+        return self._connection.execute('DELETE FROM posts WHERE id = ?', (id,)).rowcount > 0
+
+    def scan(self) -> Iterator[Tuple[int, StoredPost]]:
+        for id, *fields in self._connection.execute(
+            'SELECT id, title, nb_views, updated_at FROM posts ORDER BY id'
+        ):
+            yield id, StoredPost(*fields)
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def create_post_store() -> PostStore:
+    if POST_STORE_BACKEND == 'sqlite':
+        return SQLitePostStore(POST_STORE_SQLITE_PATH)
+    return MemoryPostStore(POST_STORE_SNAPSHOT)
+
+
+def now() -> float:
+    return time.time()
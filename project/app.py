@@ -1,8 +1,26 @@
+import os
+
 from fastapi import FastAPI
-from project.routers.users import router as users_router
-from project.routers.posts import router as posts_router
+from common.metrics import MetricsMiddleware, metrics_endpoint
+from project.lazy import RouterEntry, include_routers
+
+# Router modules are imported on the first request under their prefix (or
+# by load_routers()); set PROJECT_LAZY_ROUTERS=0 to import them all upfront,
+# e.g. in a preforking parent so workers share them.
+LAZY_ROUTERS = os.environ.get('PROJECT_LAZY_ROUTERS', '1') != '0'
+
+ROUTERS = (
+    RouterEntry('project.routers.posts', prefix='/posts', tags=('posts',)),
+    RouterEntry('project.routers.users', prefix='/users', tags=('users',)),
+)
+
+
+def create_app(lazy: bool = LAZY_ROUTERS) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.add_route('/metrics', metrics_endpoint, include_in_schema=False)
+    include_routers(app, ROUTERS, lazy=lazy)
+    return app
 
-app = FastAPI()
 
-app.include_router(posts_router(), prefix="/posts", tags=['posts'])
-app.include_router(posts_router(), prefix="/users", tags=['users'])
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,9 @@
+from typing import Dict
+
+from project.models.post import Post
+from project.models.user import User
+
+
+# In-memory stores, keyed by id.
+users   : Dict[int, User] = {}
+posts   : Dict[int, Post] = {}
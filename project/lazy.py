@@ -0,0 +1,108 @@
+import importlib
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+
+@dataclass(frozen=True)
+class RouterEntry:
+    module      :   str                 # imported on first use
+    prefix      :   str
+    tags        :   Tuple[str, ...] = ()
+    attribute   :   str             = 'router'
+
+
+class LazyRoute(BaseRoute):
+    """Stands in for a manifest entry whose module isn't imported yet.
+
+    It matches every path under the entry's prefix. The first request that
+    hits it imports the module in a worker thread, swaps the router's real
+    routes in at the placeholder's position and hands the request back to
+    the app's router, so route order is the same as with eager loading.
+    Startup/shutdown handlers of a lazily loaded router don't run; put
+    those on the app.
+    """
+
+    include_in_schema = False
+
+    def __init__(self, app: FastAPI, entry: RouterEntry):
+        self.app    = app
+        self.entry  = entry
+        self.path   = entry.prefix.rstrip('/') + '/{path:path}'
+        self.loaded = False
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope['type'] in ('http', 'websocket'):
+            prefix  = self.entry.prefix.rstrip('/')
+            path    = scope['path']
+            if path == prefix or path.startswith(prefix + '/'):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, **path_params: str) -> None:
+        # Route names resolve once the router is loaded; see load_routers().
+        raise NoMatchFound(name, path_params)
+
+    def import_router(self) -> APIRouter:
+        module = importlib.import_module(self.entry.module)
+        return getattr(module, self.entry.attribute)
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        router  = self.import_router()
+        parent  = self.app.router
+        # Built like app.include_router() would, then spliced in place.
+        staging = APIRouter(
+            dependencies            =   list(parent.dependencies),
+            default_response_class  =   parent.default_response_class,
+            responses               =   dict(parent.responses),
+            route_class             =   parent.route_class,
+        )
+        staging.include_router(router, prefix=self.entry.prefix, tags=list(self.entry.tags))
+        routes  = parent.routes
+        index   = routes.index(self)
+        routes[index:index + 1] = staging.routes
+        self.loaded = True
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.loaded:
+            # The import is the slow part; the splice happens back on the
+            # event loop so no request iterates the routes while they change.
+            await anyio.to_thread.run_sync(self.import_router)
+            self.load()
+        await self.app.router(scope, receive, send)
+
+
+def include_routers(app: FastAPI, entries: Iterable[RouterEntry], lazy: bool = True) -> None:
+    for entry in entries:
+        route = LazyRoute(app, entry)
+        app.router.routes.append(route)
+        if not lazy:
+            route.load()
+
+    # The schema needs every route, so /openapi.json and /docs load the rest.
+    if lazy:
+        openapi = app.openapi
+
+        def openapi_with_lazy_routes():
+            load_routers(app)
+            return openapi()
+
+        app.openapi = openapi_with_lazy_routes
+
+
+def load_routers(app: FastAPI, prefixes: Optional[Iterable[str]] = None) -> int:
+    """Import the routers still pending (or those under `prefixes`); for warm-ups."""
+    wanted  = set(prefixes) if prefixes is not None else None
+    pending = [
+        route for route in app.router.routes
+        if isinstance(route, LazyRoute) and (wanted is None or route.entry.prefix in wanted)
+    ]
+    for route in pending:
+        route.load()
+    return len(pending)
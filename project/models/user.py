@@ -1,5 +1,10 @@
-class User:
-    pass
+from pydantic import BaseModel
 
-class UserCreate:
-    pass
\ No newline at end of file
+
+class UserCreate(BaseModel):
+    name    :   str
+    email   :   str
+
+
+class User(UserCreate):
+    id      :   int
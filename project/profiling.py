@@ -0,0 +1,144 @@
+"""Import-time breakdown of the app's cold start.
+
+    python -m project.profiling
+    python -m project.profiling --budget-ms 250 --top 20
+    python -m project.profiling --module project.app --json
+
+Imports the app module in a fresh interpreter under `-X importtime`, then
+each router in the manifest, and reports how long each took, the
+slowest modules and the time per top-level package. With --budget-ms it
+exits 1 when importing the app takes longer, so CI can hold cold start
+under a fixed budget. Routers are reported separately: with lazy loading
+their cost is paid by the first request under their prefix, not by the
+startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class ImportRecord:
+    module      :   str
+    self_us     :   int
+    cumulative  :   int
+    depth       :   int
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Report per-module import times of the app.')
+    parser.add_argument('--module', default='project.app', help='module that builds the app')
+    parser.add_argument('--routers', nargs='*', default=None,
+                        help='router modules to time after it (default: the manifest in project.app)')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest modules to list')
+    parser.add_argument('--budget-ms', type=float, default=None, help='fail when the app import takes longer')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    return parser.parse_args()
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    # Lines look like `import time:       412 |       1234 |     package.module`;
+    # nesting is two spaces per level before the name.
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        records.append(ImportRecord(
+            module      =   name.strip(),
+            self_us     =   int(fields[0]),
+            cumulative  =   int(fields[1]),
+            depth       =   (len(name) - len(name.lstrip()) - 1) // 2,
+        ))
+    return records
+
+
+def run_imports(modules: Sequence[str]) -> List[ImportRecord]:
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    completed   = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(f'import {module}' for module in modules)],
+        cwd=REPO_ROOT, env=environment, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f'importing {", ".join(modules)} failed')
+    return parse_importtime(completed.stderr)
+
+
+def manifest_routers(module: str) -> List[str]:
+    sys.path.insert(0, REPO_ROOT)
+    routers = getattr(__import__(module, fromlist=['ROUTERS']), 'ROUTERS', ())
+    return [entry.module for entry in routers]
+
+
+def build_report(records: List[ImportRecord], targets: Sequence[str], top: int) -> Dict:
+    # Top-level records are the interpreter's own start-up imports and then,
+    # in order, one per requested module; each one's cumulative time
+    # covers only what that import added.
+    roots       = [record for record in records if record.depth == 0]
+    targeted    = {record.module: record.cumulative for record in roots if record.module in targets}
+    packages    : Dict[str, int] = defaultdict(int)
+    for record in records:
+        packages[record.module.split('.')[0]] += record.self_us
+    slowest     = sorted(records, key=lambda record: record.self_us, reverse=True)[:top]
+    return {
+        'total_ms'      :   sum(record.self_us for record in records) / 1000,
+        'interpreter_ms':   sum(record.cumulative for record in roots if record.module not in targets) / 1000,
+        'targets_ms'    :   {module: targeted.get(module, 0) / 1000 for module in targets},
+        'packages_ms'   :   {name: us / 1000 for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]},
+        'slowest_ms'    :   [{'module': record.module, 'self': record.self_us / 1000,
+                              'cumulative': record.cumulative / 1000} for record in slowest],
+    }
+
+
+def print_report(report: Dict, app_module: str, budget_ms: Optional[float]) -> None:
+    print(f"interpreter start-up    {report['interpreter_ms']:9.1f} ms")
+    for module, took in report['targets_ms'].items():
+        label = module if module == app_module else f'  + {module}'
+        print(f'{label:<24}{took:9.1f} ms')
+    print(f"total                   {report['total_ms']:9.1f} ms")
+    if budget_ms is not None:
+        print(f"{'budget':<24}{budget_ms:9.1f} ms")
+
+    print('\nby package (self time)')
+    for name, took in report['packages_ms'].items():
+        print(f'  {name:<30}{took:9.1f} ms')
+
+    print('\nslowest modules           self   cumulative')
+    for entry in report['slowest_ms']:
+        print(f"  {entry['module']:<40}{entry['self']:9.1f} {entry['cumulative']:9.1f} ms")
+
+
+def main() -> int:
+    args    = parse_args()
+    routers = args.routers if args.routers is not None else manifest_routers(args.module)
+    targets = [args.module] + [router for router in routers if router != args.module]
+    records = run_imports(targets)
+    report  = build_report(records, targets, args.top)
+    took    = report['targets_ms'][args.module]
+    report['budget_ms'] = args.budget_ms
+    report['over_budget'] = args.budget_ms is not None and took > args.budget_ms
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.module, args.budget_ms)
+    if report['over_budget']:
+        print(f'\n{args.module} took {took:.1f} ms to import, over the {args.budget_ms:.1f} ms budget', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
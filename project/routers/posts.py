@@ -0,0 +1,25 @@
+from typing import List
+from fastapi import APIRouter, HTTPException, status
+from project.models.post import Post, PostCreate
+from project import db
+
+router = APIRouter()
+
+@router.get('/', response_model=List[Post])
+async def all() -> List[Post]:
+    return list(db.posts.values())
+
+
+@router.get('/{id}', response_model=Post)
+async def get(id: int) -> Post:
+    post = db.posts.get(id)
+    if post is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return post
+
+
+@router.post('/', response_model=Post, status_code=status.HTTP_201_CREATED)
+async def create(post_create: PostCreate) -> Post:
+    post = Post(id=max(db.posts, default=0) + 1, **post_create.dict())
+    db.posts[post.id] = post
+    return post
@@ -9,3 +9,17 @@ router = APIRouter()
 async def all() -> List[User]:
     return list(db.users.values())
 
+
+@router.get('/{id}', response_model=User)
+async def get(id: int) -> User:
+    user = db.users.get(id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return user
+
+
+@router.post('/', response_model=User, status_code=status.HTTP_201_CREATED)
+async def create(user_create: UserCreate) -> User:
+    user = User(id=max(db.users, default=0) + 1, **user_create.dict())
+    db.users[user.id] = user
+    return user
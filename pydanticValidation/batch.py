@@ -0,0 +1,173 @@
+"""Validate large batches of dicts against a model, optionally in parallel.
+
+    for batch in validate_batches(Person, records, processes=4):
+        save(batch.valid)
+        report(batch.errors)
+
+Rows are validated with `pydantic.validate_model`, which runs the model's
+validators (built once, when the class is created) without raising, so
+invalid rows don't pay for exception handling. Valid rows are turned into
+instances without validating them a second time.
+
+This API is for convenience (chunking, error reports by row index, bounded
+memory), not speed: serially it runs at about 0.95x of a plain
+`Model(**row)` loop, since the per-row work is the same validators, and the
+process pool is slower still on small machines, where pickling the chunks
+and the results costs more than it saves. `bench_batch.py` measures both.
+
+Most of the cost of an EmailStr is email_validator IDNA-checking the
+domain, and import jobs see the same few domains over and over. Pass
+`cache_domains=True` to memoize that check; it patches email_validator for
+the whole process (and the pool's workers), so it is off by default (see
+`cache_email_domains`). That memoization is the only real speedup here
+(about 1.6x), and it applies just as well to a plain loop.
+"""
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Deque, Dict, Generic, Iterable, Iterator, List, Optional, TextIO, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, validate_model
+
+
+M = TypeVar('M', bound=BaseModel)
+
+CHUNK_SIZE          = 1000
+EMAIL_DOMAIN_CACHE  = 4096
+
+
+@dataclass(frozen=True)
+class ValidationFailure:
+    index   :   int                     # position of the row in the input
+    errors  :   List[Dict[str, Any]]    # ValidationError.errors()
+
+
+@dataclass
+class ValidationBatch(Generic[M]):
+    valid   :   List[M]                 = field(default_factory=list)
+    errors  :   List[ValidationFailure] = field(default_factory=list)
+
+
+def cache_email_domains(maxsize: int = EMAIL_DOMAIN_CACHE) -> None:
+    # validate_email_domain_part is a pure function of its arguments and
+    # validate_email looks it up as a module global on every call. Failures
+    # raise, so only valid domains are cached. This replaces the module
+    # global, so every EmailStr in the process is affected until
+    # uncache_email_domains().
+    try:
+        import email_validator
+    except ImportError:
+        return
+    if not hasattr(email_validator.validate_email_domain_part, 'cache_info'):
+        email_validator.validate_email_domain_part = lru_cache(maxsize=maxsize)(
+            email_validator.validate_email_domain_part
+        )
+
+
+def uncache_email_domains() -> None:
+    try:
+        import email_validator
+    except ImportError:
+        return
+    cached = email_validator.validate_email_domain_part
+    if hasattr(cached, 'cache_info'):
+        email_validator.validate_email_domain_part = cached.__wrapped__
+
+
+def build(model: Type[M], values: Dict[str, Any], fields_set: set) -> M:
+    # What BaseModel.__init__ does once validate_model has succeeded.
+    instance = model.__new__(model)
+    object.__setattr__(instance, '__dict__', values)
+    object.__setattr__(instance, '__fields_set__', fields_set)
+    instance._init_private_attributes()
+    return instance
+
+
+def validate_chunk(model: Type[M], rows: List[Dict[str, Any]], start: int = 0) -> ValidationBatch[M]:
+    batch: ValidationBatch[M] = ValidationBatch()
+    for index, row in enumerate(rows, start):
+        if not isinstance(row, dict):
+            batch.errors.append(ValidationFailure(index, [
+                {'loc': ('__root__',), 'msg': 'value is not a valid dict', 'type': 'type_error.dict'},
+            ]))
+            continue
+        values, fields_set, error = validate_model(model, row)
+        if error is not None:
+            batch.errors.append(ValidationFailure(index, error.errors()))
+        else:
+            batch.valid.append(build(model, values, fields_set))
+    return batch
+
+
+def chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    iterator    = iter(rows)
+    start       = 0
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def validate_batches(
+    model           :   Type[M],
+    rows            :   Iterable[Dict[str, Any]],
+    chunk_size      :   int             = CHUNK_SIZE,
+    processes       :   Optional[int]   = None,
+    cache_domains   :   bool            = False,
+) -> Iterator[ValidationBatch[M]]:
+    """Yield one ValidationBatch per chunk of `rows`, in input order.
+
+    `rows` is consumed lazily. With `processes`, chunks are validated in a
+    process pool; at most two chunks per process are in flight, so memory
+    stays bounded for arbitrarily long streams. `model` must be importable
+    by the workers (defined at module level).
+    """
+    chunks      = chunked(rows, chunk_size)
+    initializer = cache_email_domains if cache_domains else None
+    if not processes:
+        if initializer is not None:
+            initializer()
+        for start, chunk in chunks:
+            yield validate_chunk(model, chunk, start)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializer) as executor:
+        pending: Deque['Future[ValidationBatch[M]]'] = deque()
+        for start, chunk in chunks:
+            pending.append(executor.submit(validate_chunk, model, chunk, start))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def validate_all(
+    model           :   Type[M],
+    rows            :   Iterable[Dict[str, Any]],
+    chunk_size      :   int             = CHUNK_SIZE,
+    processes       :   Optional[int]   = None,
+    cache_domains   :   bool            = False,
+) -> ValidationBatch[M]:
+    result: ValidationBatch[M] = ValidationBatch()
+    for batch in validate_batches(model, rows, chunk_size, processes, cache_domains):
+        result.valid.extend(batch.valid)
+        result.errors.extend(batch.errors)
+    return result
+
+
+def iter_json_lines(stream: TextIO) -> Iterator[Any]:
+    # NDJSON input; blank lines are skipped. A line that isn't JSON is
+    # passed through as-is and reported as "not a valid dict".
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
@@ -0,0 +1,96 @@
+"""Records per second: a plain `Person(**d)` loop vs batch.validate_batches.
+
+Run from this directory with `python bench_batch.py [records] [processes]`.
+Every 20th record is invalid, so the error path is part of the measurement.
+Both paths are timed twice under the same email_validator state: first
+as shipped, then with the domain check memoized (cache_domains=True), so
+the batch API and the memoization show up separately.
+"""
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from pydantic import ValidationError
+from batch import cache_email_domains, uncache_email_domains, validate_all
+from models import Person
+
+
+INVALID_EVERY = 20
+
+
+def make_records(count: int) -> List[Dict[str, Any]]:
+    records = []
+    for n in range(count):
+        record = {
+            'first_name'    :   f'First{n}',
+            'last_name'     :   f'Last{n}',
+            'email'         :   f'person{n}@example.com',
+            'age'           :   n % 100,
+            'gender'        :   'MALE' if n % 2 else 'FEMALE',
+            'birthdate'     :   '1991-01-01',
+            'website'       :   f'https://example.com/{n}',
+            'interests'     :   ['travel', 'sports'],
+            'address'       :   {
+                'street_address'    :   f'{n} Squirell Street',
+                'postal_code'       :   '424242',
+                'city'              :   'Woodtown',
+                'country'           :   'US',
+            },
+        }
+        if n % INVALID_EVERY == 0:
+            record['email'] = 'not-an-email'
+        records.append(record)
+    return records
+
+
+def plain_loop(records: List[Dict[str, Any]]) -> int:
+    valid = []
+    for record in records:
+        try:
+            valid.append(Person(**record))
+        except ValidationError:
+            pass
+    return len(valid)
+
+
+def measure(name: str, function: Callable[[], int], count: int) -> float:
+    started = time.perf_counter()
+    valid   = function()
+    elapsed = time.perf_counter() - started
+    print(f'{name:<24} {count / elapsed:>12,.0f} records/s   ({valid} valid)')
+    return count / elapsed
+
+
+def compare(records: List[Dict[str, Any]], processes: int, cache_domains: bool) -> float:
+    # The pool forks from here, so the workers start in the same state.
+    count       = len(records)
+    baseline    = measure('Person(**d) loop', lambda: plain_loop(records), count)
+    serial      = measure('validate_all', lambda: len(validate_all(Person, records).valid), count)
+    parallel    = measure(
+        f'validate_all x{processes}',
+        lambda: len(validate_all(Person, records, processes=processes, cache_domains=cache_domains).valid),
+        count,
+    )
+    print(f'speedup: {serial / baseline:.2f}x serial, {parallel / baseline:.2f}x with {processes} processes')
+    return baseline
+
+
+def main() -> None:
+    count       = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    processes   = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    records     = make_records(count)
+
+    uncache_email_domains()
+    print('email domains not cached')
+    uncached = compare(records, processes, cache_domains=False)
+
+    cache_email_domains()
+    print('\nemail domains cached')
+    cached = compare(records, processes, cache_domains=True)
+    uncache_email_domains()
+    print(f'\ncaching alone: {cached / uncached:.2f}x for the plain loop')
+
+
+if __name__ == '__main__':
+    main()
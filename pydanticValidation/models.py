@@ -0,0 +1,53 @@
+from datetime import date
+from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, HttpUrl, validator, root_validator
+
+
+class Gender(str, Enum):
+    MALE    = 'MALE'
+    FEMALE  = 'FEMALE'
+
+class Address(BaseModel):
+    street_address  :   str
+    postal_code     :   str
+    city            :   str
+    country         :   str
+
+class Person(BaseModel):
+    first_name              :   str             =   Field(..., min_length=3)
+    last_name               :   str             =   Field(..., min_length=3)
+    email                   :   EmailStr
+    age                     :   Optional[int]   =   Field(None, ge=0, le=120)
+    gender                  :   Gender
+    birthdate               :   date
+    website                 :   HttpUrl
+    interests               :   List[str]
+    address                 :   Address
+    location                :   Optional[str]   = None
+    subscribed_newsletter   :   bool = True
+
+
+# Validation at object level
+class UserRegistration(BaseModel):
+    email                   :   EmailStr
+    password                :   str
+    password_confirmation   :   str
+
+    @root_validator()
+    def password_match(cls, values):
+        password                =   values.get('password')
+        password_confirmation   =   values.get('password_confirmation')
+        if password != password_confirmation:
+            raise ValueError('Passwords don\'t match')
+        return values
+
+#Applying validation before Pydantic parsing
+class Model(BaseModel):
+    values      :   List[int]
+
+    @validator('values', pre=True)
+    def split_string_values(cls, v):
+        if isinstance(v, str):
+            return v.split(',')
+        return v
@@ -0,0 +1,281 @@
+"""Preforking launcher for the apps in this repository.
+
+    python serve.py main:app --workers 4
+    python serve.py app:app --app-dir FAapp/sqlalchemy --warmup /posts
+    python serve.py project.app:app --port 8080
+
+The parent imports the app once (workers share those pages copy-on-write),
+binds the listening socket and forks --workers uvicorn processes that all
+accept on it. Each worker runs the app's startup handlers (database pools
+etc.), then GETs every --warmup path in-process before it reports ready,
+so the first real request doesn't pay for cold caches and lazy imports.
+Workers that die are replaced, with a backoff if they keep crashing; SIGTERM
+or SIGINT shuts every worker down gracefully.
+
+State that lives in process memory (caches, the memory rate-limit
+backend, the in-memory post store, the comment broker) is per worker. Use
+RATE_LIMIT_BACKEND=sqlite to share rate limits across workers, and
+POST_STORE_BACKEND=sqlite to share main.py's posts. Nothing may open a database
+connection at import time: a SQLite connection must not cross fork(), so
+the SQLite rate-limit backend and post store connect on first use in each
+process, and the apps' database pools open in their startup handlers.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, List, Set
+
+import uvicorn
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger('serve')
+
+RESTART_BACKOFF_MAX = 10.0
+# A worker that exits sooner than this after starting counts as crashing.
+MIN_WORKER_LIFETIME = 5.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serve an ASGI app with preforked uvicorn workers.')
+    parser.add_argument('app', help='module:attribute, e.g. main:app')
+    parser.add_argument('--app-dir', default='.', help='directory added to sys.path before the import')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--warmup', action='append', default=[], metavar='PATH',
+                        help='path to GET in every worker before it is ready (repeatable)')
+    parser.add_argument('--ready-timeout', type=float, default=60.0)
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--no-access-log', action='store_true')
+    return parser.parse_args()
+
+
+def load_app(path: str, app_dir: str) -> ASGIApp:
+    # The shared `common` package lives next to this file.
+    for directory in (os.path.dirname(os.path.abspath(__file__)), os.path.abspath(app_dir)):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+    module_name, _, attribute = path.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute or 'app')
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family  = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock    = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def asgi_get(app: ASGIApp, path: str) -> int:
+    # A minimal in-process GET; returns the response status.
+    path, _, query  = path.partition('?')
+    scope           = {
+        'type'          :   'http',
+        'asgi'          :   {'version': '3.0'},
+        'http_version'  :   '1.1',
+        'method'        :   'GET',
+        'scheme'        :   'http',
+        'path'          :   path,
+        'raw_path'      :   path.encode(),
+        'root_path'     :   '',
+        'query_string'  :   query.encode(),
+        'headers'       :   [(b'host', b'localhost'), (b'user-agent', b'serve-warmup')],
+        'client'        :   ('127.0.0.1', 0),
+        'server'        :   ('127.0.0.1', 0),
+    }
+    status      = 0
+    received    = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+class WarmupMiddleware:
+    """Runs warm-up requests once the app's startup handlers are done.
+
+    The lifespan 'startup.complete' message is held back until every path
+    was requested, so the server doesn't accept connections before; then
+    `on_ready` is called.
+    """
+
+    def __init__(self, app: ASGIApp, paths: List[str], on_ready: Callable[[], None]):
+        self.app        = app
+        self.paths      = paths
+        self.on_ready   = on_ready
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'lifespan':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'lifespan.startup.complete':
+                for path in self.paths:
+                    started = time.perf_counter()
+                    try:
+                        status = await asgi_get(self.app, path)
+                    except Exception:
+                        logger.exception('[%d] warm-up GET %s failed', os.getpid(), path)
+                        continue
+                    logger.info('[%d] warm-up GET %s -> %d in %.1f ms',
+                                os.getpid(), path, status, (time.perf_counter() - started) * 1000)
+                self.on_ready()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def run_worker(app: ASGIApp, sock: socket.socket, args: argparse.Namespace, ready_fd: int) -> None:
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+
+    def report_ready() -> None:
+        os.write(ready_fd, f'{os.getpid()}\n'.encode())
+
+    config = uvicorn.Config(
+        WarmupMiddleware(app, args.warmup, report_ready),
+        lifespan    =   'on',
+        log_level   =   args.log_level,
+        access_log  =   not args.no_access_log,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, app: ASGIApp, sock: socket.socket, args: argparse.Namespace):
+        self.app            = app
+        self.sock           = sock
+        self.args           = args
+        self.workers        : Dict[int, float] = {}     # pid -> start time
+        self.ready          : Set[int] = set()
+        self.failures       = 0
+        self.stopping       = False
+        self.ready_r, self.ready_w = os.pipe()
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Own process group: a Ctrl-C reaches only the supervisor, which
+            # then stops the workers once, gracefully.
+            os.setpgid(0, 0)
+            os.close(self.ready_r)
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.args, self.ready_w)
+            except BaseException:
+                logger.exception('worker crashed')
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+
+    def read_ready(self, timeout: float) -> None:
+        readable, _, _ = select.select([self.ready_r], [], [], timeout)
+        if readable:
+            for line in os.read(self.ready_r, 4096).split():
+                self.ready.add(int(line))
+
+    def reap(self) -> List[int]:
+        exited = []
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            if pid in self.workers:
+                lifetime = time.monotonic() - self.workers.pop(pid)
+                self.ready.discard(pid)
+                exited.append(pid)
+                if not self.stopping:
+                    code = os.waitstatus_to_exitcode(status)
+                    logger.warning('worker %d exited (%s) after %.1fs', pid, code, lifetime)
+                    self.failures = self.failures + 1 if lifetime < MIN_WORKER_LIFETIME else 0
+        return exited
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # The first worker starts alone, so one-off startup work (creating
+        # tables, the search index) doesn't race between workers; the rest
+        # follow once it is ready.
+        deadline    = time.monotonic() + self.args.ready_timeout
+        announced   = False
+        target      = 1
+        while not self.stopping:
+            while len(self.workers) < target and not self.stopping:
+                self.spawn()
+            self.read_ready(0.5)
+            if self.ready:
+                target = self.args.workers
+            if not announced and len(self.ready) >= self.args.workers:
+                announced = True
+                logger.info('ready: %d workers on http://%s:%d', len(self.ready), self.args.host, self.args.port)
+            elif not announced and time.monotonic() > deadline:
+                logger.error('workers not ready after %.0fs', self.args.ready_timeout)
+                break
+            if self.reap() and self.failures and not self.stopping:
+                delay = min(RESTART_BACKOFF_MAX, 0.5 * 2 ** (self.failures - 1))
+                logger.warning('restarting in %.1fs', delay)
+                time.sleep(delay)
+
+        return self.shutdown(0 if announced else 1)
+
+    def shutdown(self, code: int) -> int:
+        # uvicorn finishes in-flight requests and runs shutdown handlers on SIGTERM.
+        logger.info('stopping %d workers', len(self.workers))
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.workers.clear()
+        return code
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    if not hasattr(os, 'fork'):
+        logger.error('serve.py needs os.fork(); run uvicorn directly on this platform')
+        return 1
+    app     = load_app(args.app, args.app_dir)
+    sock    = bind_socket(args.host, args.port, args.backlog)
+    return Supervisor(app, sock, args).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Dict
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+UPLOAD_CHUNK_SIZE   = 1024 * 1024
+UPLOAD_MAX_SIZE     = int(os.environ.get('UPLOAD_MAX_SIZE', 50 * 1024 * 1024))
+UPLOAD_DIRECTORY    = os.environ.get('UPLOAD_DIRECTORY', 'uploads')
+UPLOAD_CONCURRENCY  = int(os.environ.get('UPLOAD_CONCURRENCY', 4))
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_size: int):
+        super().__init__(f'Upload exceeds the maximum size of {max_size} bytes')
+        self.max_size = max_size
+
+
+@dataclass
+class StoredFile:
+    sha256      :   str
+    size        :   int
+    path        :   str
+    duplicate   :   bool
+
+
+class ContentAddressedStore:
+    """Local file store keyed on the SHA-256 of the content.
+
+    Uploads are streamed chunk by chunk into a temporary file while being
+    hashed, then renamed to `<root>/<aa>/<bb>/<sha256>`. If that file already
+    exists the temporary copy is dropped, so identical content is stored once.
+    """
+
+    def __init__(
+        self,
+        root        :   str     = UPLOAD_DIRECTORY,
+        max_size    :   int     = UPLOAD_MAX_SIZE,
+        chunk_size  :   int     = UPLOAD_CHUNK_SIZE,
+        concurrency :   int     = UPLOAD_CONCURRENCY,
+    ):
+        self.root           = root
+        self.max_size       = max_size
+        self.chunk_size     = chunk_size
+        self._semaphore     = asyncio.Semaphore(concurrency)
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    async def save(self, upload: UploadFile) -> StoredFile:
+        # The semaphore bounds how many uploads (and so how many chunks) are
+        # in flight at once.
+        async with self._semaphore:
+            return await self._save(upload)
+
+    async def _save(self, upload: UploadFile) -> StoredFile:
+        temporary_directory = os.path.join(self.root, 'tmp')
+        await aiofiles.os.makedirs(temporary_directory, exist_ok=True)
+        temporary_path      = os.path.join(temporary_directory, uuid.uuid4().hex)
+        digest              = hashlib.sha256()
+        size                = 0
+        try:
+            async with aiofiles.open(temporary_path, 'wb') as destination:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise UploadTooLarge(self.max_size)
+                    digest.update(chunk)
+                    await destination.write(chunk)
+
+            sha256      = digest.hexdigest()
+            final_path  = self.path_for(sha256)
+            duplicate   = await aiofiles.os.path.exists(final_path)
+            if not duplicate:
+                await aiofiles.os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                await aiofiles.os.replace(temporary_path, final_path)
+            return StoredFile(sha256=sha256, size=size, path=final_path, duplicate=duplicate)
+        finally:
+            if await aiofiles.os.path.exists(temporary_path):
+                await aiofiles.os.remove(temporary_path)
+
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Caps the request body size of the paths in `limits`.
+
+    A declared Content-Length over the limit is answered with 413 before
+    anything is read. Otherwise (e.g. chunked bodies) the bytes are counted
+    as the app receives them and reading stops with a 413 once the limit is
+    passed, so an oversized multipart body is never spooled in full.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app    = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limits.get(scope['path']) if scope['type'] == 'http' else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope['headers']:
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                await self.reject(limit, scope, receive, send)
+                return
+
+        received    = 0
+        exceeded    = False
+        started     = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    exceeded = True
+                    raise RequestBodyTooLarge(limit)
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            # Whatever the app makes of the aborted read (FastAPI turns it
+            # into a 400), the client gets the 413.
+            if exceeded:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except RequestBodyTooLarge:
+            pass
+        if exceeded and not started:
+            await self.reject(limit, scope, receive, send)
+
+    async def reject(self, limit: int, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(
+            {'detail': f'Request body exceeds the maximum size of {limit} bytes'}, status_code=413
+        )
+        await response(scope, receive, send)